@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""
+Build Grant Figures
+
+Discovers figure-spec modules under figures/ and renders them in parallel
+worker processes with a non-interactive matplotlib backend. Figures whose
+spec source and input data are unchanged since the last build are skipped,
+and a manifest of outputs is written for the Typst templates.
+
+A figure-spec module defines at module level:
+- FIGURE_NAME: unique name of the figure (used as the manifest key)
+- DATA_FILES: input files, relative to the repository root
+- render(output_dir): draws the figure and returns the written paths
+
+In Typst (compiled with --root .):
+    #let figures = json("/figures/manifest.json")
+    #image(figures.nih_grant_workflow.png)
+"""
+
+import os
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse  # noqa: E402
+import ast  # noqa: E402
+import hashlib  # noqa: E402
+import importlib.util  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+from concurrent.futures import ProcessPoolExecutor, as_completed  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Dict, List, Optional  # noqa: E402
+
+FIGURES_DIR = Path(__file__).parent
+ROOT_DIR = FIGURES_DIR.parent
+CACHE_FILE = FIGURES_DIR / ".figure_cache.json"
+MANIFEST_FILE = FIGURES_DIR / "manifest.json"
+
+
+def _literal(node: ast.AST):
+    """Evaluate a literal AST node, or None if it is not a literal"""
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def read_spec(path: Path) -> Optional[Dict]:
+    """Read a figure spec from a module's source without importing it"""
+    try:
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+    except SyntaxError:
+        return None
+
+    values = {}
+    has_render = False
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "render":
+            has_render = True
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id in (
+                    "FIGURE_NAME",
+                    "OUTPUT_NAME",
+                    "DATA_FILES",
+                ):
+                    values[target.id] = node.value
+
+    if not has_render or "FIGURE_NAME" not in values:
+        return None
+
+    # FIGURE_NAME may alias another module-level string constant
+    name_node = values["FIGURE_NAME"]
+    if isinstance(name_node, ast.Name) and name_node.id in values:
+        name_node = values[name_node.id]
+    name = _literal(name_node)
+    data_files = _literal(values["DATA_FILES"]) if "DATA_FILES" in values else []
+
+    if not isinstance(name, str):
+        return None
+
+    return {"name": name, "module": path, "data_files": list(data_files or [])}
+
+
+def discover_specs(figures_dir: Path = FIGURES_DIR) -> List[Dict]:
+    """Find all figure-spec modules under the figures directory"""
+    specs = []
+    for path in sorted(figures_dir.rglob("*.py")):
+        if path.resolve() == Path(__file__).resolve():
+            continue
+        spec = read_spec(path)
+        if spec:
+            specs.append(spec)
+    return specs
+
+
+def spec_hash(spec: Dict, root_dir: Path = ROOT_DIR) -> str:
+    """Hash of a figure's spec source and all of its input data"""
+    digest = hashlib.sha256()
+    digest.update(spec["module"].read_bytes())
+    for data_file in sorted(spec["data_files"]):
+        path = root_dir / data_file
+        digest.update(data_file.encode())
+        if path.exists():
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def _render_spec(module_path: str, output_dir: str) -> List[str]:
+    """Import a spec module and render it (runs in a worker process)"""
+    module_path = Path(module_path)
+    sys.path.insert(0, str(module_path.parent))
+    spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    import matplotlib.pyplot as plt
+
+    outputs = module.render(Path(output_dir))
+    plt.close("all")
+    return [str(path) for path in outputs]
+
+
+def _load_json(path: Path) -> Dict:
+    """Load a JSON file, treating a missing or corrupt file as empty"""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _typst_path(path: Path, root_dir: Path) -> Optional[str]:
+    """Root-relative path usable from Typst documents compiled with --root
+
+    Returns None for paths outside the root, which Typst cannot read.
+    """
+    try:
+        return "/" + Path(path).resolve().relative_to(root_dir.resolve()).as_posix()
+    except ValueError:
+        return None
+
+
+def _cache_key(name: str, output_dir: Path) -> str:
+    """Cache entries are per figure and output directory"""
+    return f"{name}@{Path(output_dir).resolve()}"
+
+
+def build_figures(
+    output_dir: Path = FIGURES_DIR,
+    only: List[str] = None,
+    force: bool = False,
+    jobs: int = None,
+    root_dir: Path = ROOT_DIR,
+) -> Dict:
+    """Render all out-of-date figures and write the manifest
+
+    Returns the manifest, mapping figure names to their outputs by format.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    all_specs = discover_specs()
+    specs = [spec for spec in all_specs if not only or spec["name"] in only]
+
+    cache = _load_json(CACHE_FILE)
+
+    stale = []
+    for spec in specs:
+        spec["hash"] = spec_hash(spec, root_dir)
+        cached = cache.get(_cache_key(spec["name"], output_dir), {})
+        up_to_date = (
+            not force
+            and cached.get("hash") == spec["hash"]
+            and cached.get("outputs")
+            and all(Path(path).exists() for path in cached["outputs"])
+        )
+        if up_to_date:
+            print(f"  {spec['name']}: up to date")
+        else:
+            stale.append(spec)
+
+    failed = []
+    if stale:
+        print(f"Rendering {len(stale)} figure(s)...")
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(_render_spec, str(spec["module"]), str(output_dir)): spec
+                for spec in stale
+            }
+            for future in as_completed(futures):
+                spec = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    print(f"  {spec['name']}: failed ({e})", file=sys.stderr)
+                    failed.append(spec["name"])
+                    continue
+                cache[_cache_key(spec["name"], output_dir)] = {
+                    "hash": spec["hash"],
+                    "outputs": outputs,
+                }
+                print(f"  {spec['name']}: rendered")
+
+    CACHE_FILE.write_text(json.dumps(cache, indent=2, sort_keys=True) + "\n")
+
+    # Manifest lists every current figure built in this output directory,
+    # including ones not rebuilt this run; Typst can only read inside the root
+    manifest = {}
+    if _typst_path(output_dir, root_dir) is None:
+        print(f"  {output_dir} is outside {root_dir}; manifest not updated")
+    else:
+        for spec in all_specs:
+            entry = cache.get(_cache_key(spec["name"], output_dir))
+            if entry:
+                manifest[spec["name"]] = {
+                    Path(path).suffix.lstrip("."): _typst_path(path, root_dir)
+                    for path in entry["outputs"]
+                    if _typst_path(path, root_dir)
+                }
+        MANIFEST_FILE.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+    if failed:
+        raise RuntimeError(f"Failed to render: {', '.join(sorted(failed))}")
+
+    return manifest
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Render grant figures in parallel, skipping unchanged ones"
+    )
+    parser.add_argument(
+        "figures", nargs="*", help="Figure names to build (default: all)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(FIGURES_DIR),
+        help="Directory for rendered figures (default: figures/)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Rebuild even if inputs are unchanged"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Number of worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List discovered figure specs and exit"
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        for spec in discover_specs():
+            print(f"{spec['name']}: {spec['module'].relative_to(ROOT_DIR)}")
+        return
+
+    try:
+        build_figures(
+            Path(args.output_dir), only=args.figures, force=args.force, jobs=args.jobs
+        )
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if _typst_path(Path(args.output_dir), ROOT_DIR) is not None:
+        print(f"Manifest written to {MANIFEST_FILE.relative_to(ROOT_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,47 +4,356 @@
 Generate NIH Grant Workflow Diagram
 
 Creates a visual flowchart showing the progression from template to submission-ready document.
-"""
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch
-import numpy as np
+The diagram is described as a node/edge graph and laid out automatically in
+layers. Rendering is skipped when the graph is unchanged since the last run,
+and the PNG and PDF exports are rendered in parallel worker processes.
+"""
 
+import argparse
+import hashlib
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import matplotlib.patches as patches  # noqa: E402
+from matplotlib.patches import FancyBboxPatch  # noqa: E402
+import numpy as np  # noqa: E402
+
+FIGURES_DIR = Path(__file__).parent
+sys.path.insert(0, str(FIGURES_DIR.parent / "scripts" / "helpers"))
+
+from profiling import (  # noqa: E402
+    add_profile_arguments,
+    collect,
+    merge,
+    setup as setup_profiling,
+    span,
+    traced,
+)
+
+OUTPUT_NAME = "nih_grant_workflow"
+
+# Figure spec for build_figures.py
+FIGURE_NAME = OUTPUT_NAME
+DATA_FILES = []
+
+TITLE = "NIH Grant Workflow: Template to Submission"
+FIGSIZE = (14, 18)
+DPI = 300
+
+# Color scheme
+COLORS = {
+    "start": "#e1f5fe",  # Light blue
+    "process": "#fff3e0",  # Light orange
+    "decision": "#fce4ec",  # Light pink
+    "success": "#c8e6c9",  # Light green
+    "revision": "#ffecb3",  # Light yellow
+}
+
+# Nodes: (id, label, shape, color)
+NODES = [
+    ("start", "Start: Need NIH Grant", "box", "start"),
+    ("quick_start", "Run quick_start.py", "box", "process"),
+    ("grant_type", "Select\nGrant Type", "diamond", "decision"),
+    ("r01", "R01\nMajor Research\n12 pages", "box", "process"),
+    ("r03", "R03\nSmall Grant\n6 pages", "box", "process"),
+    ("r21", "R21\nExploratory\n6 pages", "box", "process"),
+    ("details", "Enter Project Details", "box", "process"),
+    ("copied", "Template Copied to\nmy_grants/project_name/", "box", "process"),
+    ("edit", "Edit Core Documents", "box", "process"),
+    ("aims", "Specific Aims\n1 page", "box", "process"),
+    ("strategy", "Research Strategy\n6-12 pages", "box", "process"),
+    ("biosketch", "Biosketch\n5 pages/person", "box", "process"),
+    ("budget", "Budget &\nJustification", "box", "process"),
+    ("content_review", "Content\nReview", "diamond", "decision"),
+    ("revise", "Revise Content", "box", "revision"),
+    ("compile", "Compile with Typst", "box", "process"),
+    ("pdf", "Generate PDF", "box", "process"),
+    ("quality", "Quality\nCheck", "diamond", "decision"),
+    ("fix_format", "Fix Formatting", "box", "revision"),
+    ("edit_content", "Edit Content", "box", "revision"),
+    ("internal_review", "Internal Review", "box", "process"),
+    ("feedback", "Feedback", "diamond", "decision"),
+    ("substantial", "Substantial\nRevisions", "box", "revision"),
+    ("polish", "Polish &\nFinal Edits", "box", "process"),
+    ("final", "Final Compilation", "box", "process"),
+    ("submission", "Submission-Ready PDF", "box", "success"),
+]
+
+# Edges: (source, target, label)
+EDGES = [
+    ("start", "quick_start", ""),
+    ("quick_start", "grant_type", ""),
+    ("grant_type", "r01", ""),
+    ("grant_type", "r03", ""),
+    ("grant_type", "r21", ""),
+    ("r01", "details", ""),
+    ("r03", "details", ""),
+    ("r21", "details", ""),
+    ("details", "copied", ""),
+    ("copied", "edit", ""),
+    ("edit", "aims", ""),
+    ("edit", "strategy", ""),
+    ("edit", "biosketch", ""),
+    ("edit", "budget", ""),
+    ("aims", "content_review", ""),
+    ("strategy", "content_review", ""),
+    ("biosketch", "content_review", ""),
+    ("budget", "content_review", ""),
+    ("content_review", "revise", "Needs Work"),
+    ("revise", "edit", ""),
+    ("content_review", "compile", "Ready"),
+    ("compile", "pdf", ""),
+    ("pdf", "quality", ""),
+    ("quality", "fix_format", "Format Issues"),
+    ("quality", "edit_content", "Content Issues"),
+    ("fix_format", "compile", ""),
+    ("edit_content", "edit", ""),
+    ("quality", "internal_review", "Ready"),
+    ("internal_review", "feedback", ""),
+    ("feedback", "substantial", "Major Changes"),
+    ("feedback", "polish", "Minor Changes"),
+    ("substantial", "edit", ""),
+    ("feedback", "final", "Approved"),
+    ("polish", "final", ""),
+    ("final", "submission", ""),
+]
+
+LEGEND = [
+    ("Start/End", "start"),
+    ("Process", "process"),
+    ("Decision", "decision"),
+    ("Success", "success"),
+    ("Revision", "revision"),
+]
+
+# Drawing area in data coordinates
+X_RANGE = (0, 10)
+Y_RANGE = (0, 20)
+
+
+def graph_hash() -> str:
+    """Content hash of everything that affects the rendered diagram"""
+    spec = {
+        # The drawing code (layout, edge routing) affects the output too
+        "source": hashlib.sha256(Path(__file__).read_bytes()).hexdigest(),
+        "title": TITLE,
+        "figsize": FIGSIZE,
+        "dpi": DPI,
+        "colors": COLORS,
+        "nodes": NODES,
+        "edges": EDGES,
+        "legend": LEGEND,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+@traced("diagram.assign_layers")
+def assign_layers(
+    nodes: List[Tuple], edges: List[Tuple]
+) -> Tuple[Dict[str, int], List[Tuple]]:
+    """Assign each node a layer by longest path, ignoring cycle-closing edges
+
+    Returns the layer of each node and the list of back edges (revision loops)
+    that were excluded from layering.
+    """
+    node_ids = [node[0] for node in nodes]
+    successors = {node_id: [] for node_id in node_ids}
+    for source, target, _ in edges:
+        successors[source].append(target)
+
+    # Depth-first search from the first node finds the edges closing cycles
+    back_edges = set()
+    state = {}
+
+    def visit(node_id):
+        state[node_id] = "active"
+        for target in successors[node_id]:
+            if state.get(target) == "active":
+                back_edges.add((node_id, target))
+            elif target not in state:
+                visit(target)
+        state[node_id] = "done"
+
+    for node_id in node_ids:
+        if node_id not in state:
+            visit(node_id)
+
+    # Longest-path layering over the remaining DAG, in topological order
+    layers = {node_id: 0 for node_id in node_ids}
+    forward = [(s, t) for s, t, _ in edges if (s, t) not in back_edges]
+    for _ in node_ids:
+        changed = False
+        for source, target in forward:
+            if layers[target] < layers[source] + 1:
+                layers[target] = layers[source] + 1
+                changed = True
+        if not changed:
+            break
+
+    return layers, [edge for edge in edges if (edge[0], edge[1]) in back_edges]
+
+
+def end_side(positions: Dict[str, Tuple[float, float]], node_id: str) -> Optional[int]:
+    """-1 or 1 if a node is the only end of its row reachable from that
+    margin (leftmost or rightmost), None if it is alone or in the middle"""
+    x, y = positions[node_id]
+    row = [other_x for other_x, other_y in positions.values() if other_y == y]
+    leftmost, rightmost = x == min(row), x == max(row)
+    if leftmost == rightmost:
+        return None
+    return -1 if leftmost else 1
+
+
+@traced("diagram.layout")
+def layout(
+    nodes: List[Tuple], edges: List[Tuple]
+) -> Tuple[Dict[str, Tuple[float, float]], Dict[Tuple[str, str], int]]:
+    """Compute (x, y) centers for every node using a layered layout
+
+    Also returns the margin (-1 left, 1 right) each revision loop runs up.
+    A loop uses the side its target can be entered from, and its source is
+    placed at that end of its own row so it can leave sideways.
+    """
+    layers, back_edges = assign_layers(nodes, edges)
+    loop_targets = {}
+    for source, target, _ in back_edges:
+        loop_targets.setdefault(source, target)
+    sides = {}
+    n_layers = max(layers.values()) + 1
+
+    # Group nodes by layer, keeping declaration order as the initial ordering
+    rows = [[] for _ in range(n_layers)]
+    for node in nodes:
+        rows[layers[node[0]]].append(node[0])
+
+    # Top margin leaves room for the title, bottom margin for the legend
+    top, bottom = Y_RANGE[1] - 1.5, Y_RANGE[0] + 0.5
+    step = (top - bottom) / max(n_layers - 1, 1)
+
+    positions = {}
+    predecessors = {node[0]: [] for node in nodes}
+    for source, target, _ in edges:
+        if layers[source] < layers[target]:
+            predecessors[target].append(source)
+
+    for layer, row in enumerate(rows):
+        # Order each layer by the mean x of its predecessors to reduce crossings
+        if layer > 0:
+            row.sort(
+                key=lambda n: np.mean([positions[p][0] for p in predecessors[n]])
+                if predecessors[n]
+                else 5.0
+            )
+        # Revision loops run up the margins, so their sources go to the ends of
+        # the row where the loop can leave sideways without crossing other edges
+        loops = [n for n in row if n in loop_targets]
+        if loops:
+            xs = np.linspace(X_RANGE[0], X_RANGE[1], len(row) + 2)[1:-1]
+            tentative = dict(zip(row, xs))
+            row_sides = {}
+            for n in loops:
+                side = end_side(positions, loop_targets[n])
+                if side is not None and side not in row_sides.values():
+                    row_sides[n] = side
+            for n in loops:
+                if n in row_sides:
+                    continue
+                # Free choice: the emptier side of this row, then of the whole
+                # diagram, then the side the node was sorted towards
+                used = list(row_sides.values())
+                overall = list(sides.values()) + used
+                row_sides[n] = min(
+                    (-1, 1),
+                    key=lambda s: (used.count(s), overall.count(s), s * (5 - tentative[n])),
+                )
+            inner = [n for n in row if n not in loop_targets]
+            left = [n for n in loops if row_sides[n] == -1]
+            right = [n for n in loops if row_sides[n] == 1]
+            row[:] = left + inner + right
+            sides.update({(n, loop_targets[n]): s for n, s in row_sides.items()})
+        xs = np.linspace(X_RANGE[0], X_RANGE[1], len(row) + 2)[1:-1]
+        for node_id, x in zip(row, xs):
+            positions[node_id] = (float(x), top - layer * step)
+
+    return positions, sides
+
+
+def node_width(positions: Dict[str, Tuple[float, float]], node_id: str) -> float:
+    """Width of a node, shrinking boxes in crowded layers"""
+    y = positions[node_id][1]
+    crowd = sum(1 for _, other_y in positions.values() if other_y == y)
+    spacing = (X_RANGE[1] - X_RANGE[0]) / (crowd + 1)
+    return min(2.5, spacing * 0.8 - 0.2)
+
+
+@traced("diagram.build_figure")
+def build_figure():
+    """Draw the workflow diagram and return the matplotlib figure"""
+    fig, ax = plt.subplots(1, 1, figsize=FIGSIZE)
+    ax.set_xlim(*X_RANGE)
+    ax.set_ylim(*Y_RANGE)
+    ax.axis("off")
 
-def create_workflow_diagram():
-    """Create and save the NIH grant workflow diagram"""
+    positions, sides = layout(NODES, EDGES)
+    shapes = {node_id: shape for node_id, _, shape, _ in NODES}
+    box_height = 0.6
 
-    fig, ax = plt.subplots(1, 1, figsize=(14, 18))
-    ax.set_xlim(0, 10)
-    ax.set_ylim(0, 20)
-    ax.axis("off")
+    def half_height(node_id):
+        return 0.45 if shapes[node_id] == "diamond" else box_height / 2 + 0.1
 
-    # Color scheme
-    colors = {
-        "start": "#e1f5fe",  # Light blue
-        "process": "#fff3e0",  # Light orange
-        "decision": "#fce4ec",  # Light pink
-        "success": "#c8e6c9",  # Light green
-        "revision": "#ffecb3",  # Light yellow
-    }
+    def half_width(node_id):
+        return 0.9 if shapes[node_id] == "diamond" else node_width(positions, node_id) / 2 + 0.1
 
-    # Helper function to create boxes
-    def create_box(x, y, width, height, text, color, text_size=10):
-        box = FancyBboxPatch(
-            (x - width / 2, y - height / 2),
-            width,
-            height,
-            boxstyle="round,pad=0.1",
-            facecolor=color,
-            edgecolor="black",
-            linewidth=1.5,
+    # Margin lanes, outermost first: loops to higher targets run outside the
+    # others, so no loop's run into its target crosses another loop's lane
+    lanes, entries = {}, {}
+    for side in (-1, 1):
+        group = sorted(
+            (edge for edge, s in sides.items() if s == side),
+            key=lambda edge: (-positions[edge[1]][1], positions[edge[0]][1]),
         )
-        ax.add_patch(box)
+        for lane, edge in enumerate(group):
+            lanes[edge] = lane
+            # Loops sharing a target enter it stacked, outer lanes higher
+            entries[edge] = sum(1 for other in group[:lane] if other[1] == edge[1])
+
+    for node_id, label, shape, color in NODES:
+        x, y = positions[node_id]
+        width = node_width(positions, node_id)
+        text_size = 9 if label.count("\n") >= 2 else 10
+
+        if shape == "diamond":
+            patch = patches.Polygon(
+                [(x - 0.9, y), (x, y + 0.45), (x + 0.9, y), (x, y - 0.45)],
+                facecolor=COLORS[color],
+                edgecolor="black",
+                linewidth=1.5,
+            )
+            text_size = 9
+        else:
+            patch = FancyBboxPatch(
+                (x - width / 2, y - box_height / 2),
+                width,
+                box_height,
+                boxstyle="round,pad=0.1",
+                facecolor=COLORS[color],
+                edgecolor="black",
+                linewidth=1.5,
+            )
+        ax.add_patch(patch)
         ax.text(
             x,
             y,
-            text,
+            label,
             ha="center",
             va="center",
             fontsize=text_size,
@@ -52,198 +361,173 @@ def create_workflow_diagram():
             wrap=True,
         )
 
-    # Helper function to create diamond (decision)
-    def create_diamond(x, y, width, height, text, color, text_size=9):
-        diamond = patches.RegularPolygon(
-            (x, y),
-            4,
-            radius=width / 2,
-            orientation=np.pi / 4,
-            facecolor=color,
-            edgecolor="black",
-            linewidth=1.5,
-        )
-        ax.add_patch(diamond)
-        ax.text(
-            x, y, text, ha="center", va="center", fontsize=text_size, fontweight="bold"
-        )
+    for source, target, text in EDGES:
+        (x1, y1), (x2, y2) = positions[source], positions[target]
+
+        if (source, target) in sides:
+            # Revision loops run up a margin lane and enter the target's side
+            side, lane = sides[(source, target)], lanes[(source, target)]
+            margin_x = 5 + side * (4.7 - 0.15 * lane)
+
+            if end_side(positions, source) in (side, None):
+                xs, ys = [x1 + side * half_width(source), margin_x], [y1, y1]
+            else:
+                # Boxed in: leave from the bottom (only if a row has many loops)
+                below_y = y1 - half_height(source) - 0.2
+                xs = [x1, x1, margin_x]
+                ys = [y1 - half_height(source), below_y, below_y]
+
+            if end_side(positions, target) in (side, None):
+                entry_y = y2 + (0.15 - 0.15 * entries[(source, target)]) * (
+                    shapes[target] != "diamond"
+                )
+                ax.plot(xs + [margin_x], ys + [entry_y], color="#888888", lw=2)
+                start = (margin_x, entry_y)
+                end = (x2 + side * half_width(target), entry_y)
+            else:
+                # Target boxed in: drop into its top from just above it
+                entry_x = x2 + side * (0.3 + 0.15 * lane)
+                top_y = y2 + half_height(target) + 0.2
+                ax.plot(
+                    xs + [margin_x, entry_x], ys + [top_y, top_y], color="#888888", lw=2
+                )
+                start = (entry_x, top_y)
+                end = (entry_x, y2 + half_height(target))
+            color = "#888888"
+        else:
+            start = (x1, y1 - half_height(source))
+            end = (x2, y2 + half_height(target))
+            color = "black"
 
-    # Helper function to draw arrows
-    def draw_arrow(x1, y1, x2, y2, text=""):
         ax.annotate(
             "",
-            xy=(x2, y2),
-            xytext=(x1, y1),
-            arrowprops=dict(arrowstyle="->", lw=2, color="black"),
+            xy=end,
+            xytext=start,
+            arrowprops=dict(arrowstyle="->", lw=2, color=color),
         )
         if text:
-            mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
+            label_x = start[0] + 0.35 * (end[0] - start[0])
+            label_y = start[1] + 0.35 * (end[1] - start[1])
             ax.text(
-                mid_x + 0.3,
-                mid_y,
+                label_x,
+                label_y,
                 text,
                 fontsize=8,
+                ha="center",
+                va="center",
                 bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8),
             )
 
     # Title
     ax.text(
         5,
-        19.5,
-        "NIH Grant Workflow: Template to Submission",
+        Y_RANGE[1] - 0.5,
+        TITLE,
         ha="center",
         va="center",
         fontsize=18,
         fontweight="bold",
     )
 
-    # Start
-    create_box(5, 18.5, 2.5, 0.6, "Start: Need NIH Grant", colors["start"])
-
-    # Quick start
-    create_box(5, 17.5, 2.5, 0.6, "Run quick_start.py", colors["process"])
-    draw_arrow(5, 18.2, 5, 17.8)
-
-    # Grant type selection
-    create_diamond(5, 16.3, 1.8, 1.8, "Select\nGrant Type", colors["decision"])
-    draw_arrow(5, 17.2, 5, 17)
-
-    # Grant types
-    create_box(2, 15, 1.8, 0.8, "R01\nMajor Research\n12 pages", colors["process"], 8)
-    create_box(5, 15, 1.8, 0.8, "R03\nSmall Grant\n6 pages", colors["process"], 8)
-    create_box(8, 15, 1.8, 0.8, "R21\nExploratory\n6 pages", colors["process"], 8)
-
-    draw_arrow(4.2, 15.8, 2.8, 15.4)
-    draw_arrow(5, 15.8, 5, 15.4)
-    draw_arrow(5.8, 15.8, 7.2, 15.4)
-
-    # Project details
-    create_box(5, 13.8, 2.5, 0.6, "Enter Project Details", colors["process"])
-    draw_arrow(2, 14.6, 4, 14.1)
-    draw_arrow(5, 14.6, 5, 14.1)
-    draw_arrow(8, 14.6, 6, 14.1)
-
-    # Template copied
-    create_box(
-        5,
-        12.8,
-        3,
-        0.6,
-        "Template Copied to\nmy_grants/project_name/",
-        colors["process"],
-    )
-    draw_arrow(5, 13.5, 5, 13.1)
-
-    # Edit documents
-    create_box(5, 11.8, 2.5, 0.6, "Edit Core Documents", colors["process"])
-    draw_arrow(5, 12.5, 5, 12.1)
-
-    # Document types
-    create_box(1.5, 10.5, 1.8, 0.6, "Specific Aims\n1 page", colors["process"], 9)
-    create_box(
-        3.5, 10.5, 1.8, 0.6, "Research Strategy\n6-12 pages", colors["process"], 9
-    )
-    create_box(6.5, 10.5, 1.8, 0.6, "Biosketch\n5 pages/person", colors["process"], 9)
-    create_box(8.5, 10.5, 1.8, 0.6, "Budget &\nJustification", colors["process"], 9)
-
-    draw_arrow(4.2, 11.5, 1.5, 10.8)
-    draw_arrow(4.5, 11.5, 3.5, 10.8)
-    draw_arrow(5.5, 11.5, 6.5, 10.8)
-    draw_arrow(5.8, 11.5, 8.5, 10.8)
-
-    # Content review
-    create_diamond(5, 9, 1.8, 1.8, "Content\nReview", colors["decision"])
-    draw_arrow(1.5, 10.2, 4.2, 9.5)
-    draw_arrow(3.5, 10.2, 4.5, 9.5)
-    draw_arrow(6.5, 10.2, 5.5, 9.5)
-    draw_arrow(8.5, 10.2, 5.8, 9.5)
-
-    # Revision cycle
-    create_box(8, 9, 1.8, 0.6, "Revise Content", colors["revision"])
-    draw_arrow(5.8, 9, 7.2, 9, "Needs Work")
-    draw_arrow(8, 9.3, 8, 11.2)
-    draw_arrow(7.8, 11.5, 5.8, 11.5)
-
-    # Compile
-    create_box(5, 7.5, 2.5, 0.6, "Compile with Typst", colors["process"])
-    draw_arrow(5, 8.2, 5, 7.8, "Ready")
-
-    # Generate PDF
-    create_box(5, 6.5, 2.5, 0.6, "Generate PDF", colors["process"])
-    draw_arrow(5, 7.2, 5, 6.8)
-
-    # Quality check
-    create_diamond(5, 5.3, 1.8, 1.8, "Quality\nCheck", colors["decision"])
-    draw_arrow(5, 6.2, 5, 6)
-
-    # Format/content fixes
-    create_box(2, 5.3, 1.8, 0.6, "Fix Formatting", colors["revision"])
-    create_box(8, 5.3, 1.8, 0.6, "Edit Content", colors["revision"])
-
-    draw_arrow(4.2, 5.3, 2.8, 5.3, "Format Issues")
-    draw_arrow(5.8, 5.3, 7.2, 5.3, "Content Issues")
-    draw_arrow(2, 5.6, 2, 7.2)
-    draw_arrow(2.2, 7.5, 3.8, 7.5)
-    draw_arrow(8, 5.6, 8, 11.2)
-
-    # Internal review
-    create_box(5, 3.8, 2.5, 0.6, "Internal Review", colors["process"])
-    draw_arrow(5, 4.5, 5, 4.1, "Ready")
-
-    # Feedback
-    create_diamond(5, 2.6, 1.8, 1.8, "Feedback", colors["decision"])
-    draw_arrow(5, 3.5, 5, 3.3)
-
-    # Revision paths
-    create_box(1.5, 2.6, 1.8, 0.6, "Substantial\nRevisions", colors["revision"])
-    create_box(8.5, 2.6, 1.8, 0.6, "Polish &\nFinal Edits", colors["process"])
-
-    draw_arrow(4.2, 2.6, 2.3, 2.6, "Major Changes")
-    draw_arrow(5.8, 2.6, 7.7, 2.6, "Minor Changes")
-    draw_arrow(1.5, 2.9, 1.5, 11.2)
-    draw_arrow(1.7, 11.5, 3.8, 11.5)
-
-    # Final compilation
-    create_box(5, 1.3, 2.5, 0.6, "Final Compilation", colors["process"])
-    draw_arrow(5, 1.9, 5, 1.6, "Approved")
-    draw_arrow(8.5, 2.3, 6.2, 1.6)
-
-    # Submission ready
-    create_box(5, 0.5, 2.8, 0.6, "Submission-Ready PDF", colors["success"])
-    draw_arrow(5, 1, 5, 0.8)
-
     # Add legend
     legend_x = 0.5
-    legend_y = 1
+    legend_y = 1.8
     ax.text(legend_x, legend_y + 0.5, "Legend:", fontsize=12, fontweight="bold")
 
-    legend_items = [
-        ("Start/End", colors["start"]),
-        ("Process", colors["process"]),
-        ("Decision", colors["decision"]),
-        ("Success", colors["success"]),
-        ("Revision", colors["revision"]),
-    ]
-
-    for i, (label, color) in enumerate(legend_items):
+    for i, (label, color) in enumerate(LEGEND):
         y_pos = legend_y - i * 0.3
         rect = patches.Rectangle(
-            (legend_x, y_pos - 0.1), 0.3, 0.2, facecolor=color, edgecolor="black"
+            (legend_x, y_pos - 0.1), 0.3, 0.2, facecolor=COLORS[color], edgecolor="black"
         )
         ax.add_patch(rect)
         ax.text(legend_x + 0.4, y_pos, label, fontsize=10, va="center")
 
     plt.tight_layout()
-    plt.savefig("figures/nih_grant_workflow.png", dpi=300, bbox_inches="tight")
-    plt.savefig("figures/nih_grant_workflow.pdf", bbox_inches="tight")
+    return fig
+
+
+def _export(path: str) -> Tuple[str, List[Dict]]:
+    """Render the diagram to a single output file (runs in a worker process)
+
+    Returns the path and the profiling spans recorded while rendering it.
+    """
+    with span("diagram.export", file=Path(path).name):
+        fig = build_figure()
+        with span("diagram.savefig", file=Path(path).name):
+            if path.endswith(".png"):
+                fig.savefig(path, dpi=DPI, bbox_inches="tight")
+            else:
+                fig.savefig(path, bbox_inches="tight")
+        plt.close(fig)
+    return path, collect()
+
+
+def create_workflow_diagram(
+    output_dir: Path = FIGURES_DIR, force: bool = False, parallel: bool = True
+):
+    """Create and save the NIH grant workflow diagram
+
+    Returns the output paths, which are left untouched when the graph has not
+    changed since they were last rendered.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [output_dir / f"{OUTPUT_NAME}.png", output_dir / f"{OUTPUT_NAME}.pdf"]
+    hash_file = output_dir / f".{OUTPUT_NAME}.hash"
+
+    digest = graph_hash()
+    up_to_date = (
+        not force
+        and hash_file.exists()
+        and hash_file.read_text().strip() == digest
+        and all(path.exists() for path in outputs)
+    )
+
+    if up_to_date:
+        print("Workflow diagram unchanged, skipping render.")
+        return outputs
+
+    if parallel:
+        with ProcessPoolExecutor(max_workers=len(outputs)) as pool:
+            for _, events in pool.map(_export, [str(path) for path in outputs]):
+                merge(events)
+    else:
+        for path in outputs:
+            _, events = _export(str(path))
+            merge(events)
+
+    hash_file.write_text(digest + "\n")
 
     print("Workflow diagrams saved as:")
-    print("- figures/nih_grant_workflow.png")
-    print("- figures/nih_grant_workflow.pdf")
+    for path in outputs:
+        print(f"- {path}")
 
-    return fig
+    return outputs
+
+
+def render(output_dir: Path) -> List[Path]:
+    """Render entry point used by build_figures.py"""
+    # build_figures.py already renders figures in a process pool
+    return create_workflow_diagram(output_dir, parallel=False)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Generate the NIH grant workflow diagram")
+    parser.add_argument(
+        "--output-dir",
+        default=str(FIGURES_DIR),
+        help="Directory for the PNG and PDF outputs (default: figures/)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Render even if the graph is unchanged"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    setup_profiling("generate_workflow_diagram", args)
+
+    create_workflow_diagram(Path(args.output_dir), force=args.force)
 
 
 if __name__ == "__main__":
-    create_workflow_diagram()
-    plt.show()
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Stop Signal Task Data Ingestion
+
+Parses raw participant-session CSVs from data/raw/behavioral/ in a process
+pool and stores them in a partitioned columnar cache under
+data/cache/stop_signal/: one directory per raw file, one memory-mappable
+NumPy array per column. Files whose contents are unchanged since the last
+ingestion are skipped, so reruns only parse new or edited sessions.
+
+Downstream figure and table scripts load just the columns they need,
+memory-mapped (zero-copy) from the cache:
+
+    from ingest_data import iter_partitions
+    for name, columns in iter_partitions(["subject_id", "rt"]):
+        ...
+
+Usage:
+    python scripts/analysis/figures/ingest_data.py
+    python scripts/analysis/figures/ingest_data.py --jobs 8 --input data/raw/behavioral/
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from process_data import (
+    DEFAULT_CHUNKSIZE,
+    INFO_COLUMNS,
+    RAW_DIR,
+    ROOT_DIR,
+    TRIAL_COLUMNS,
+    find_raw_files,
+)
+
+CACHE_DIR = ROOT_DIR / "data" / "cache" / "stop_signal"
+INDEX_FILE = "_index.json"
+
+# Columns stored as integer codes plus a categories list
+CATEGORICAL_COLUMNS = {"subject_id", "group", "sex", "session_date", "trial_type", "response"}
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def partition_name(raw_path: Path) -> str:
+    """Partition directory for a raw file, unique per resolved path"""
+    resolved = str(Path(raw_path).resolve())
+    return f"{Path(raw_path).stem}-{hashlib.sha256(resolved.encode()).hexdigest()[:8]}"
+
+
+def _load_index(cache_dir: Path) -> Dict:
+    """Load the cache index, treating a missing or corrupt index as empty"""
+    try:
+        return json.loads((cache_dir / INDEX_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def ingest_file(raw_path: str, partition_dir: str, chunksize: int) -> Tuple[str, int]:
+    """Parse one raw CSV into a partition of per-column .npy files
+
+    Runs in a worker process. The partition is written to a temporary
+    directory and renamed into place, so readers never see a partial one.
+    Numeric columns keep the dtypes pandas infers when reading the file
+    directly (integers stay integers).
+    """
+    raw_path, partition_dir = Path(raw_path), Path(partition_dir)
+    wanted = set(INFO_COLUMNS + TRIAL_COLUMNS)
+    pieces: Dict[str, List[np.ndarray]] = {}
+
+    try:
+        reader = pd.read_csv(
+            raw_path,
+            chunksize=chunksize,
+            usecols=lambda c: c in wanted,
+            dtype={column: str for column in CATEGORICAL_COLUMNS},
+        )
+        with reader:
+            for chunk in reader:
+                for column in chunk.columns:
+                    pieces.setdefault(column, []).append(chunk[column].to_numpy())
+    except pd.errors.EmptyDataError:
+        pass
+
+    tmp_dir = partition_dir.with_name(partition_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    rows = 0
+    for column, arrays in pieces.items():
+        if column in CATEGORICAL_COLUMNS:
+            values = pd.Series(np.concatenate(arrays))
+            categorical = pd.Categorical(values)
+            np.save(tmp_dir / f"{column}.npy", categorical.codes.astype(np.int32))
+            (tmp_dir / f"{column}.categories.json").write_text(
+                json.dumps([str(c) for c in categorical.categories])
+            )
+        elif all(array.dtype.kind in "biuf" for array in arrays):
+            # Chunks promote like a single read (int + float chunk -> float)
+            values = np.concatenate(arrays)
+            np.save(tmp_dir / f"{column}.npy", values)
+        else:
+            # Mixed or text values (e.g. booleans with gaps): coerce to float
+            values = pd.Series(np.concatenate(arrays)).astype(str)
+            values = values.replace({"TRUE": "1", "FALSE": "0", "True": "1", "False": "0"})
+            values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+            np.save(tmp_dir / f"{column}.npy", values)
+        rows = len(values)
+
+    shutil.rmtree(partition_dir, ignore_errors=True)
+    os.replace(tmp_dir, partition_dir)
+    return str(raw_path), rows
+
+
+def ingest(
+    raw_files: List[Path],
+    cache_dir: Path = CACHE_DIR,
+    jobs: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    force: bool = False,
+    input_dirs: Optional[List[Path]] = None,
+) -> Dict[str, int]:
+    """Bring the columnar cache up to date with a set of raw files
+
+    Files are skipped when their size and mtime are unchanged, or when they
+    changed on disk but their content hash did not (e.g. after a checkout).
+    The index is keyed by resolved path, so data ingested from other
+    directories is kept. Partitions are dropped when their raw file no longer
+    exists, or when it is directly in one of ``input_dirs`` (the directories
+    being re-ingested) but is not among ``raw_files``.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index = _load_index(cache_dir)
+    counts = {"ingested": 0, "unchanged": 0, "removed": 0, "errors": 0}
+
+    stale = []
+    current = set()
+    for path in raw_files:
+        name = str(path.resolve())
+        current.add(name)
+        stat = path.stat()
+        entry = index.get(name)
+        partition = cache_dir / partition_name(path)
+
+        if not force and entry and partition.is_dir():
+            if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                counts["unchanged"] += 1
+                continue
+            digest = file_hash(path)
+            if entry["hash"] == digest:
+                entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                counts["unchanged"] += 1
+                continue
+        else:
+            digest = file_hash(path)
+
+        index[name] = {
+            "hash": digest,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "partition": partition.name,
+        }
+        stale.append(path)
+
+    # Drop partitions whose raw file is gone from disk or from a re-ingested directory
+    input_dirs = [Path(d).resolve() for d in input_dirs or []]
+    for name in set(index) - current:
+        raw_path = Path(name)
+        if raw_path.exists() and raw_path.parent not in input_dirs:
+            continue
+        shutil.rmtree(cache_dir / index.pop(name)["partition"], ignore_errors=True)
+        counts["removed"] += 1
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(
+                    ingest_file, str(path), str(cache_dir / partition_name(path)), chunksize
+                ): path
+                for path in stale
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    _, rows = future.result()
+                except (ValueError, OSError, pd.errors.ParserError) as e:
+                    print(f"{path.name}: ERROR ingesting file: {e}", file=sys.stderr)
+                    # Never leave the previous version behind for readers to pick up
+                    index.pop(str(path.resolve()), None)
+                    shutil.rmtree(cache_dir / partition_name(path), ignore_errors=True)
+                    counts["errors"] += 1
+                    continue
+                index[str(path.resolve())]["rows"] = rows
+                counts["ingested"] += 1
+
+    (cache_dir / INDEX_FILE).write_text(json.dumps(index, indent=2, sort_keys=True) + "\n")
+    return counts
+
+
+def load_partition(
+    partition_dir: Path, columns: Optional[List[str]] = None
+) -> Dict[str, np.ndarray]:
+    """Load columns of one partition as memory-mapped arrays
+
+    Numeric columns are returned as read-only memory maps (no copy).
+    Categorical columns are returned as pandas Categoricals whose codes are
+    memory-mapped; missing values decode to NaN.
+    """
+    partition_dir = Path(partition_dir)
+    if columns is None:
+        columns = [p.stem for p in partition_dir.glob("*.npy")]
+
+    loaded = {}
+    for column in columns:
+        path = partition_dir / f"{column}.npy"
+        if not path.exists():
+            continue
+        values = np.load(path, mmap_mode="r")
+        categories_path = partition_dir / f"{column}.categories.json"
+        if categories_path.exists():
+            categories = json.loads(categories_path.read_text())
+            values = pd.Categorical.from_codes(values, categories=categories)
+        loaded[column] = values
+    return loaded
+
+
+def iter_partitions(
+    columns: Optional[List[str]] = None, cache_dir: Path = CACHE_DIR
+) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+    """Yield (raw file path, columns) for every cached partition"""
+    cache_dir = Path(cache_dir)
+    for name, entry in sorted(_load_index(cache_dir).items()):
+        yield name, load_partition(cache_dir / entry["partition"], columns)
+
+
+def iter_cached_participants(
+    raw_path: Path, chunksize: int = None, cache_dir: Path = CACHE_DIR
+) -> Iterator[pd.DataFrame]:
+    """Yield each participant's trials for a raw file from its cached partition
+
+    Drop-in replacement for process_data.iter_participants. Raises ValueError
+    if the file is not in the cache index or changed since it was ingested
+    (e.g. its last ingestion failed), rather than reading stale data.
+    """
+    raw_path = Path(raw_path)
+    entry = _load_index(Path(cache_dir)).get(str(raw_path.resolve()))
+    if entry is None:
+        raise ValueError(f"{raw_path.name} is not in the cache (ingestion failed?)")
+    stat = raw_path.stat()
+    if (entry["mtime_ns"], entry["size"]) != (stat.st_mtime_ns, stat.st_size):
+        raise ValueError(f"{raw_path.name} changed since it was cached; re-ingest it")
+    data = load_partition(Path(cache_dir) / entry["partition"])
+    if not data:
+        return
+    frame = pd.DataFrame(data)
+    subjects = frame["subject_id"].to_numpy()
+    starts = np.flatnonzero(subjects[1:] != subjects[:-1]) + 1
+    for start, end in zip(np.r_[0, starts], np.r_[starts, len(frame)]):
+        yield frame.iloc[start:end]
+
+
+def load_frame(
+    columns: Optional[List[str]] = None, cache_dir: Path = CACHE_DIR
+) -> pd.DataFrame:
+    """Load the requested columns of all partitions into one DataFrame
+
+    Unlike iter_partitions this concatenates, and therefore copies, the data.
+    """
+    frames = [
+        pd.DataFrame(data).assign(source_file=name)
+        for name, data in iter_partitions(columns, cache_dir)
+        if data
+    ]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main():
+    """Main function for CLI usage."""
+    parser = argparse.ArgumentParser(
+        description="Ingest raw stop signal task files into a columnar cache"
+    )
+    parser.add_argument(
+        "--input",
+        default=str(RAW_DIR),
+        help="Directory containing raw stop signal task files",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=str(CACHE_DIR),
+        help="Directory for the columnar cache (default: data/cache/stop_signal/)",
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Number of worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=DEFAULT_CHUNKSIZE,
+        help=f"Rows read per chunk (default: {DEFAULT_CHUNKSIZE})",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Re-ingest files even if unchanged"
+    )
+
+    args = parser.parse_args()
+
+    raw_files = find_raw_files(Path(args.input))
+    counts = ingest(
+        raw_files,
+        Path(args.cache_dir),
+        jobs=args.jobs,
+        chunksize=args.chunksize,
+        force=args.force,
+        input_dirs=[Path(args.input)],
+    )
+    print(
+        f"Ingested {counts['ingested']}, unchanged {counts['unchanged']}, "
+        f"removed {counts['removed']}, errors {counts['errors']}",
+        file=sys.stderr,
+    )
+    sys.exit(1 if counts["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Stop Signal Task Data Processing
+
+Python counterpart of data/scripts/preprocessing/behavioral_preproc_stop_signal.R.
+Reads raw trial-level CSVs from data/raw/behavioral/ in chunks, computes the
+per-participant summary measures described in
+data/cleaned/behavioral/stop_signal_task_dictionary_v1.0.md (SSRT, go RT,
+accuracies, post-error slowing, QC exclusions) with vectorized NumPy, and
+streams one summary row per participant to data/cleaned/behavioral/.
+
+Only one participant's trials are held in memory at a time, so thousands of
+participant files (or one very large file) can be processed with bounded memory.
+
+Usage:
+    python scripts/analysis/figures/process_data.py
+    python scripts/analysis/figures/process_data.py --input data/raw/behavioral/ \\
+        --output data/cleaned/behavioral/stop_signal_task_v1.0_2025-04-10.csv
+"""
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+RAW_DIR = ROOT_DIR / "data" / "raw" / "behavioral"
+CLEANED_DIR = ROOT_DIR / "data" / "cleaned" / "behavioral"
+
+FILE_PATTERN = "*StopSignal.csv"
+
+# Raw trial-level columns used by the pipeline
+INFO_COLUMNS = ["subject_id", "group", "age", "sex", "visit_number", "session_date"]
+TRIAL_COLUMNS = [
+    "trial_number",
+    "trial_type",
+    "rt",
+    "correct",
+    "successful_stop",
+    "response",
+    "ssd",
+]
+
+# Output columns, in data dictionary order
+SUMMARY_COLUMNS = INFO_COLUMNS + [
+    "ssrt",
+    "mean_go_rt",
+    "sd_go_rt",
+    "go_accuracy",
+    "stop_accuracy",
+    "omission_rate",
+    "commission_rate",
+    "mean_ssd",
+    "post_error_slowing",
+    "excluded",
+    "exclusion_reason",
+]
+
+# Preprocessing and QC thresholds (see data dictionary)
+PRACTICE_TRIALS = 10
+MIN_RT_MS = 100
+OUTLIER_SD = 3
+MIN_GO_ACCURACY = 0.8
+STOP_ACCURACY_RANGE = (0.2, 0.8)
+SSRT_RANGE_MS = (50, 500)
+MAX_ANTICIPATORY_RATE = 0.1
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def find_raw_files(input_dir: Path) -> List[Path]:
+    """Find raw stop signal task files in a directory"""
+    return sorted(Path(input_dir).glob(FILE_PATTERN))
+
+
+def _nanmean(values: np.ndarray) -> float:
+    """Mean ignoring NaN, returning NaN (without a warning) for empty input"""
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if values.size else np.nan
+
+
+def _as_float(series: pd.Series) -> np.ndarray:
+    """Convert a 0/1 or TRUE/FALSE column to a float array with NaN for missing"""
+    if series.dtype == object:
+        series = series.map(
+            {"TRUE": 1.0, "FALSE": 0.0, "True": 1.0, "False": 0.0}
+        ).fillna(pd.to_numeric(series, errors="coerce"))
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+def iter_participants(
+    path: Path, chunksize: int = DEFAULT_CHUNKSIZE
+) -> Iterator[pd.DataFrame]:
+    """Yield the trials of each participant in a raw file, one at a time
+
+    The file is read in chunks of ``chunksize`` rows, so a file holding many
+    participants never needs to fit in memory. Trials are assumed to be grouped
+    by subject_id, as written by the task software.
+    """
+    wanted = set(INFO_COLUMNS + TRIAL_COLUMNS)
+    pending = []
+
+    try:
+        reader = pd.read_csv(path, chunksize=chunksize, usecols=lambda c: c in wanted)
+    except pd.errors.EmptyDataError:
+        return
+
+    with reader:
+        for chunk in reader:
+            subjects = chunk["subject_id"].to_numpy()
+            # Row positions where a new participant starts within this chunk
+            starts = np.flatnonzero(subjects[1:] != subjects[:-1]) + 1
+
+            for start, end in zip(np.r_[0, starts], np.r_[starts, len(chunk)]):
+                block = chunk.iloc[start:end]
+                if pending and pending[-1]["subject_id"].iat[0] != block[
+                    "subject_id"
+                ].iat[0]:
+                    yield pd.concat(pending, ignore_index=True)
+                    pending = []
+                pending.append(block)
+
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def compute_metrics(trials: pd.DataFrame) -> Dict:
+    """Compute the summary measures for one participant's trials
+
+    Mirrors the steps of behavioral_preproc_stop_signal.R using array
+    operations instead of per-trial filtering.
+    """
+    summary = {
+        column: (trials[column].iat[0] if column in trials else np.nan)
+        for column in INFO_COLUMNS
+    }
+
+    trial_number = pd.to_numeric(trials["trial_number"], errors="coerce").to_numpy()
+    trial_type = trials["trial_type"].astype(str).str.lower().to_numpy()
+    rt = pd.to_numeric(trials["rt"], errors="coerce").to_numpy(dtype=float)
+    correct = _as_float(trials["correct"])
+    successful_stop = _as_float(trials["successful_stop"])
+    no_response = trials["response"].isna().to_numpy()
+    ssd = pd.to_numeric(trials["ssd"], errors="coerce").to_numpy(dtype=float)
+
+    # 1. Remove practice trials
+    keep = trial_number > PRACTICE_TRIALS
+
+    # 2. Remove anticipatory responses
+    anticipatory = keep & (rt < MIN_RT_MS)
+    anticipatory_count = int(anticipatory.sum())
+    keep &= ~anticipatory
+
+    # 3. Remove go RT outliers (>3SD above the participant's mean)
+    go_rt = rt[keep & (trial_type == "go") & ~np.isnan(rt)]
+    if go_rt.size > 1:
+        limit = go_rt.mean() + OUTLIER_SD * go_rt.std(ddof=1)
+        keep &= ~(rt > limit)
+
+    trial_type, rt, correct = trial_type[keep], rt[keep], correct[keep]
+    successful_stop, no_response, ssd = successful_stop[keep], no_response[keep], ssd[keep]
+    is_go = trial_type == "go"
+    is_stop = trial_type == "stop"
+
+    # 4. Summary statistics
+    go_rt = rt[is_go & ~np.isnan(rt)]
+    mean_go_rt = float(go_rt.mean()) if go_rt.size else np.nan
+    sd_go_rt = float(go_rt.std(ddof=1)) if go_rt.size > 1 else np.nan
+    go_accuracy = _nanmean(correct[is_go])
+    stop_accuracy = _nanmean(successful_stop[is_stop])
+    omission_rate = no_response[is_go].sum() / is_go.sum() if is_go.any() else np.nan
+    commission_rate = 1 - stop_accuracy
+    mean_ssd = _nanmean(ssd[is_stop])
+
+    # SSRT (integration method): nth fastest go RT minus mean SSD
+    ssrt = np.nan
+    if go_rt.size and not np.isnan(commission_rate):
+        n = int(np.round(go_rt.size * commission_rate))
+        if n >= 1:
+            ssrt = float(np.partition(go_rt, n - 1)[n - 1] - mean_ssd)
+
+    # Post-error slowing from trial-lagged arrays
+    prev_go = np.r_[False, is_go[:-1]]
+    prev_stop = np.r_[False, is_stop[:-1]]
+    prev_correct = np.r_[np.nan, correct[:-1]]
+    prev_successful_stop = np.r_[np.nan, successful_stop[:-1]]
+    post_correct_go_rt = _nanmean(rt[is_go & prev_go & (prev_correct == 1)])
+    post_error_go_rt = _nanmean(rt[is_go & prev_stop & (prev_successful_stop == 0)])
+    post_error_slowing = post_error_go_rt - post_correct_go_rt
+
+    # 5. QC exclusion criteria, in priority order
+    exclusion_reason = None
+    if go_accuracy < MIN_GO_ACCURACY:
+        exclusion_reason = "Go accuracy < 80%"
+    elif not STOP_ACCURACY_RANGE[0] <= stop_accuracy <= STOP_ACCURACY_RANGE[1]:
+        exclusion_reason = (
+            f"Stop accuracy outside range ({round(stop_accuracy * 100)}%)"
+            if not np.isnan(stop_accuracy)
+            else "Stop accuracy outside range (NA)"
+        )
+    elif not SSRT_RANGE_MS[0] <= ssrt <= SSRT_RANGE_MS[1]:
+        exclusion_reason = (
+            f"Invalid SSRT: {round(ssrt)}ms" if not np.isnan(ssrt) else "Invalid SSRT: NA"
+        )
+    elif len(rt) and anticipatory_count / len(rt) > MAX_ANTICIPATORY_RATE:
+        exclusion_reason = "Too many anticipatory responses"
+
+    summary.update(
+        ssrt=ssrt,
+        mean_go_rt=mean_go_rt,
+        sd_go_rt=sd_go_rt,
+        go_accuracy=go_accuracy,
+        stop_accuracy=stop_accuracy,
+        omission_rate=omission_rate,
+        commission_rate=commission_rate,
+        mean_ssd=mean_ssd,
+        post_error_slowing=post_error_slowing,
+        excluded=exclusion_reason is not None,
+        exclusion_reason=exclusion_reason,
+    )
+    return summary
+
+
+def process_files(
+    raw_files: List[Path],
+    output_path: Path,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    batch_size: int = 500,
+    log: Optional[TextIO] = None,
+    reader: Callable[[Path, int], Iterator[pd.DataFrame]] = iter_participants,
+) -> Dict[str, int]:
+    """Process raw files and stream participant summaries to a CSV
+
+    Summaries are written in batches of ``batch_size`` rows, so memory stays
+    bounded no matter how many participants are processed. ``reader`` yields
+    each participant's trials for a file; by default the raw CSV is parsed.
+    """
+    log = log or sys.stderr
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    counts = {"files": 0, "participants": 0, "excluded": 0, "errors": 0}
+    batch = []
+
+    def flush(header: bool):
+        frame = pd.DataFrame(batch, columns=SUMMARY_COLUMNS)
+        frame.to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+        batch.clear()
+
+    header = True
+    for path in raw_files:
+        counts["files"] += 1
+        participants_before = counts["participants"]
+        try:
+            for trials in reader(path, chunksize):
+                summary = compute_metrics(trials)
+                batch.append(summary)
+                counts["participants"] += 1
+                counts["excluded"] += int(summary["excluded"])
+                print(
+                    f"{path.name}: {summary['subject_id']} "
+                    f"SSRT={summary['ssrt']:.0f}ms "
+                    f"go RT={summary['mean_go_rt']:.0f}ms "
+                    f"stop acc={summary['stop_accuracy']:.0%}"
+                    + (f" EXCLUDED: {summary['exclusion_reason']}" if summary["excluded"] else ""),
+                    file=log,
+                )
+        except (KeyError, ValueError, pd.errors.ParserError) as e:
+            counts["errors"] += 1
+            print(f"{path.name}: ERROR processing file: {e}", file=log)
+            continue
+
+        if counts["participants"] == participants_before:
+            print(f"{path.name}: no trials found, skipped", file=log)
+
+        if len(batch) >= batch_size:
+            flush(header)
+            header = False
+
+    # Always write the final batch (and the header, even if nothing was processed)
+    flush(header)
+    return counts
+
+
+def main():
+    """Main function for CLI usage."""
+    parser = argparse.ArgumentParser(description="Preprocess stop signal task data")
+    parser.add_argument(
+        "--input",
+        default=str(RAW_DIR),
+        help="Directory containing raw stop signal task files",
+    )
+    parser.add_argument(
+        "--output",
+        default=str(
+            CLEANED_DIR / f"stop_signal_task_v1.0_{date.today().isoformat()}.csv"
+        ),
+        help="Output file path for processed data",
+    )
+    parser.add_argument("--log", help="Log file path (default: stderr)")
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Ingest into the columnar cache first and read trials from it",
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Worker processes for --use-cache ingestion"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=DEFAULT_CHUNKSIZE,
+        help=f"Rows read per chunk (default: {DEFAULT_CHUNKSIZE})",
+    )
+
+    args = parser.parse_args()
+
+    raw_files = find_raw_files(Path(args.input))
+    if not raw_files:
+        print(f"No {FILE_PATTERN} files found in {args.input}", file=sys.stderr)
+        sys.exit(1)
+
+    log = open(args.log, "w", encoding="utf-8") if args.log else sys.stderr
+    ingest_errors = 0
+    try:
+        print(f"Found {len(raw_files)} raw data files", file=log)
+        reader = iter_participants
+        if args.use_cache:
+            from ingest_data import ingest, iter_cached_participants
+
+            ingested = ingest(
+                raw_files,
+                jobs=args.jobs,
+                chunksize=args.chunksize,
+                input_dirs=[Path(args.input)],
+            )
+            print(
+                f"Cache: {ingested['ingested']} ingested, "
+                f"{ingested['unchanged']} unchanged, {ingested['errors']} errors",
+                file=log,
+            )
+            ingest_errors = ingested["errors"]
+            reader = iter_cached_participants
+        counts = process_files(
+            raw_files, Path(args.output), args.chunksize, log=log, reader=reader
+        )
+        print(f"Processed data written to: {args.output}", file=log)
+        print(f"Total subjects processed: {counts['participants']}", file=log)
+        print(f"Subjects excluded: {counts['excluded']}", file=log)
+    finally:
+        if log is not sys.stderr:
+            log.close()
+
+    sys.exit(1 if counts["errors"] or ingest_errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Survival Analysis for Preliminary Data Figures
+
+Kaplan-Meier curves, log-rank tests and bootstrap confidence bands computed
+from subject-level data (one row per subject with time, event and group).
+All estimators work on sorted event arrays with vectorized NumPy, for every
+group at once, and bootstrap resamples are evaluated as 2-D arrays in
+batches that can be spread across worker processes.
+
+Input CSV columns:
+    time   follow-up time
+    event  1 if the event was observed, 0 if censored
+    group  group label
+
+Pre-tabulated curves (time, surv, group), such as
+data/raw/clinical/survival_data.csv, are plotted as-is.
+
+Usage:
+    python scripts/analysis/figures/survival.py cohort.csv --bootstrap 1000
+    python scripts/analysis/figures/survival.py data/raw/clinical/survival_data.csv
+"""
+
+import argparse
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[3]
+OUTPUT_DIR = ROOT_DIR / "outputs" / "figures"
+
+# Upper bound on resample x subject elements evaluated per bootstrap batch
+BATCH_ELEMENTS = 5_000_000
+
+
+@dataclass
+class SurvivalCurve:
+    """Kaplan-Meier estimate for one group at its distinct observed times"""
+
+    group: str
+    time: np.ndarray
+    at_risk: np.ndarray
+    events: np.ndarray
+    survival: np.ndarray
+    variance: np.ndarray  # Greenwood variance of the survival estimate
+
+    def at(self, times: np.ndarray) -> np.ndarray:
+        """Evaluate the step function at arbitrary times"""
+        idx = np.searchsorted(self.time, times, side="right") - 1
+        return np.where(idx >= 0, self.survival[np.maximum(idx, 0)], 1.0)
+
+
+@dataclass
+class LogRankResult:
+    """Result of a k-group log-rank test"""
+
+    statistic: float
+    df: int
+    p_value: float
+    observed: Dict[str, float]
+    expected: Dict[str, float]
+
+
+def _encode_groups(group) -> Tuple[np.ndarray, np.ndarray]:
+    """Map group labels to integer codes"""
+    if group is None:
+        return np.array(["all"]), None
+    labels, codes = np.unique(np.asarray(group).astype(str), return_inverse=True)
+    return labels, codes
+
+
+def kaplan_meier(time, event, group=None) -> Dict[str, SurvivalCurve]:
+    """Kaplan-Meier curves for every group in a single vectorized pass"""
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event, dtype=float)
+    labels, codes = _encode_groups(group)
+    if codes is None:
+        codes = np.zeros(len(time), dtype=np.intp)
+
+    # Sort by group, then time; each distinct (group, time) is one step
+    order = np.lexsort((time, codes))
+    t, e, g = time[order], event[order], codes[order]
+    new_step = np.r_[True, (g[1:] != g[:-1]) | (t[1:] != t[:-1])]
+    starts = np.flatnonzero(new_step)
+
+    step_time = t[starts]
+    step_group = g[starts]
+    deaths = np.add.reduceat(e, starts)
+    removed = np.diff(np.r_[starts, len(t)])
+
+    # Subjects at risk: group size minus those removed at earlier steps
+    group_size = np.bincount(codes, minlength=len(labels))
+    removed_before = np.cumsum(removed) - removed
+    group_first = np.r_[True, step_group[1:] != step_group[:-1]]
+    group_offset = removed_before[group_first][np.cumsum(group_first) - 1]
+    at_risk = group_size[step_group] - (removed_before - group_offset)
+
+    # Product-limit estimate as a per-group cumulative sum of logs; a step
+    # where everyone at risk dies sets survival to zero from then on
+    with np.errstate(divide="ignore", invalid="ignore"):
+        all_die = deaths >= at_risk
+        log_factor = np.where(all_die, 0.0, np.log1p(-deaths / at_risk))
+        greenwood = np.where(all_die, 0.0, deaths / (at_risk * (at_risk - deaths)))
+
+    def group_cumsum(values):
+        total = np.cumsum(values)
+        return total - (total - values)[group_first][np.cumsum(group_first) - 1]
+
+    survival = np.exp(group_cumsum(log_factor))
+    survival[group_cumsum(all_die.astype(float)) > 0] = 0.0
+    variance = survival**2 * group_cumsum(greenwood)
+
+    curves = {}
+    bounds = np.r_[np.flatnonzero(group_first), len(step_time)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        label = str(labels[step_group[start]])
+        curves[label] = SurvivalCurve(
+            group=label,
+            time=step_time[start:end],
+            at_risk=at_risk[start:end],
+            events=deaths[start:end],
+            survival=survival[start:end],
+            variance=variance[start:end],
+        )
+    return curves
+
+
+def _chi2_sf(x: float, df: int) -> float:
+    """Chi-square survival function via the regularized upper incomplete gamma"""
+    if x <= 0:
+        return 1.0
+    a, z = df / 2.0, x / 2.0
+    log_prefix = a * math.log(z) - z - math.lgamma(a)
+
+    if z < a + 1:
+        # Series for the lower incomplete gamma
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= z / n
+            total += term
+        return max(0.0, 1.0 - math.exp(log_prefix) * total)
+
+    # Continued fraction for the upper incomplete gamma (modified Lentz)
+    tiny = 1e-300
+    b = z + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def logrank_test(time, event, group) -> LogRankResult:
+    """k-group log-rank test computed over all distinct event times at once"""
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event, dtype=float)
+    labels, codes = _encode_groups(group)
+    n_groups = len(labels)
+
+    event_times = np.unique(time[event > 0])
+
+    # at_risk[t, g]: subjects in group g with time >= t
+    at_risk = np.empty((len(event_times), n_groups))
+    for k in range(n_groups):
+        group_times = np.sort(time[codes == k])
+        at_risk[:, k] = len(group_times) - np.searchsorted(
+            group_times, event_times, side="left"
+        )
+
+    # deaths[t, g]: events in group g at time t
+    deaths = np.zeros_like(at_risk)
+    observed_idx = np.searchsorted(event_times, time[event > 0])
+    np.add.at(deaths, (observed_idx, codes[event > 0]), event[event > 0])
+
+    total_risk = at_risk.sum(axis=1)
+    total_deaths = deaths.sum(axis=1)
+    share = at_risk / total_risk[:, None]
+    expected = total_deaths[:, None] * share
+
+    observed_total = deaths.sum(axis=0)
+    expected_total = expected.sum(axis=0)
+    diff = observed_total - expected_total
+
+    # Hypergeometric covariance of observed counts, summed over event times
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(
+            total_risk > 1,
+            total_deaths * (total_risk - total_deaths) / (total_risk - 1),
+            0.0,
+        )
+    covariance = np.einsum("t,tg,th->gh", scale, share, -share)
+    covariance[np.diag_indices(n_groups)] += np.einsum("t,tg->g", scale, share)
+
+    # Drop one group: the full covariance matrix is singular
+    statistic = float(diff[:-1] @ np.linalg.pinv(covariance[:-1, :-1]) @ diff[:-1])
+    df = n_groups - 1
+
+    return LogRankResult(
+        statistic=statistic,
+        df=df,
+        p_value=_chi2_sf(statistic, df),
+        observed=dict(zip(labels.tolist(), observed_total.tolist())),
+        expected=dict(zip(labels.tolist(), expected_total.tolist())),
+    )
+
+
+def _bootstrap_batch(
+    time: np.ndarray,
+    event: np.ndarray,
+    grid: np.ndarray,
+    n_resamples: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Survival on a time grid for a batch of bootstrap resamples
+
+    Each row of the (n_resamples x n) index array is one resample. Rows are
+    sorted by time with events before censorings at tied times, so processing
+    subjects one at a time reproduces the tied-time product-limit factors.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(time)
+    idx = rng.integers(0, n, size=(n_resamples, n))
+    t, e = time[idx], event[idx]
+
+    order = np.lexsort((-e, t), axis=-1)
+    t = np.take_along_axis(t, order, axis=1)
+    e = np.take_along_axis(e, order, axis=1)
+
+    at_risk = n - np.arange(n)
+    dies_out = np.cumsum(e * (at_risk == 1), axis=1) > 0
+    log_surv = np.cumsum(np.log1p(-e / np.maximum(at_risk, 2)), axis=1)
+    survival = np.where(dies_out, 0.0, np.exp(log_surv))
+
+    # Vectorized searchsorted across rows by offsetting each row's times
+    span = max(t.max(), grid.max()) - min(t.min(), grid.min()) + 1
+    offsets = np.arange(n_resamples)[:, None] * span
+    flat = (t + offsets).ravel()
+    positions = np.searchsorted(flat, (grid[None, :] + offsets).ravel(), side="right")
+    positions = positions.reshape(n_resamples, len(grid)) - np.arange(n_resamples)[:, None] * n - 1
+
+    rows = np.arange(n_resamples)[:, None]
+    return np.where(positions >= 0, survival[rows, np.maximum(positions, 0)], 1.0)
+
+
+def bootstrap_bands(
+    time,
+    event,
+    group=None,
+    n_boot: int = 1000,
+    alpha: float = 0.05,
+    grid: Optional[np.ndarray] = None,
+    batch_size: Optional[int] = None,
+    jobs: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Pointwise bootstrap confidence bands for each group's survival curve
+
+    Returns {group: (grid, lower, upper)}. Resamples are drawn in batches of
+    ``batch_size`` rows (sized from BATCH_ELEMENTS by default) and, when
+    ``jobs`` > 1, batches are evaluated in parallel worker processes.
+    """
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event, dtype=float)
+    labels, codes = _encode_groups(group)
+    if codes is None:
+        codes = np.zeros(len(time), dtype=np.intp)
+    if grid is None:
+        grid = np.linspace(0, time.max(), 200)
+    grid = np.asarray(grid, dtype=float)
+
+    root_seed = np.random.SeedSequence(seed)
+    bands = {}
+
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs and jobs > 1 else None
+    try:
+        for k, label in enumerate(labels):
+            group_time, group_event = time[codes == k], event[codes == k]
+            size = batch_size or max(1, BATCH_ELEMENTS // max(len(group_time), 1))
+            batches = [min(size, n_boot - start) for start in range(0, n_boot, size)]
+            seeds = root_seed.spawn(len(batches))
+            args = [(group_time, group_event, grid, b, s) for b, s in zip(batches, seeds)]
+
+            if pool:
+                results = list(pool.map(_bootstrap_batch, *zip(*args)))
+            else:
+                results = [_bootstrap_batch(*a) for a in args]
+
+            samples = np.vstack(results)
+            lower, upper = np.quantile(samples, [alpha / 2, 1 - alpha / 2], axis=0)
+            bands[str(label)] = (grid, lower, upper)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return bands
+
+
+def plot_survival(
+    curves: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    output_path: Path,
+    bands: Optional[Dict] = None,
+    title: str = "Kaplan-Meier Survival Estimates",
+):
+    """Plot step survival curves (and optional bands) to a file"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for label, (times, survival) in curves.items():
+        line = ax.step(
+            np.r_[0, times], np.r_[1.0, survival], where="post", label=label, lw=2
+        )[0]
+        if bands and label in bands:
+            grid, lower, upper = bands[label]
+            ax.fill_between(
+                grid, lower, upper, step="post", alpha=0.2, color=line.get_color()
+            )
+
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Survival probability")
+    ax.set_ylim(0, 1.05)
+    ax.set_title(title)
+    ax.legend(title="Group")
+    ax.grid(alpha=0.3)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(output_path, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main():
+    """Main function for CLI usage."""
+    parser = argparse.ArgumentParser(
+        description="Kaplan-Meier curves, log-rank test and bootstrap bands"
+    )
+    parser.add_argument("input_file", help="CSV with time,event,group or time,surv,group")
+    parser.add_argument(
+        "--output",
+        "-o",
+        default=str(OUTPUT_DIR / "kaplan_meier.png"),
+        help="Figure path (default: outputs/figures/kaplan_meier.png)",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Number of bootstrap resamples for confidence bands (default: none)",
+    )
+    parser.add_argument(
+        "--alpha", type=float, default=0.05, help="Band significance level (default: 0.05)"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Worker processes for bootstrap batches"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Bootstrap random seed")
+
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.input_file)
+    group = data["group"] if "group" in data else None
+
+    if "surv" in data:
+        # Pre-tabulated curves: plot as-is
+        curves = {
+            str(label): (frame["time"].to_numpy(), frame["surv"].to_numpy())
+            for label, frame in data.groupby("group", sort=False)
+        }
+        plot_survival(curves, Path(args.output))
+        print(f"Plotted {len(curves)} pre-tabulated curves to {args.output}")
+        return
+
+    missing = {"time", "event"} - set(data.columns)
+    if missing:
+        print(f"Missing columns: {', '.join(sorted(missing))}", file=sys.stderr)
+        sys.exit(1)
+
+    km = kaplan_meier(data["time"], data["event"], group)
+    curves = {label: (c.time, c.survival) for label, c in km.items()}
+
+    for label, curve in km.items():
+        median_idx = np.flatnonzero(curve.survival <= 0.5)
+        median = curve.time[median_idx[0]] if median_idx.size else float("nan")
+        print(f"{label}: n={int(curve.at_risk[0])}, events={int(curve.events.sum())}, median={median:g}")
+
+    if group is not None and len(km) > 1:
+        result = logrank_test(data["time"], data["event"], group)
+        print(f"Log-rank: chi2={result.statistic:.3f}, df={result.df}, p={result.p_value:.3g}")
+
+    bands = None
+    if args.bootstrap:
+        bands = bootstrap_bands(
+            data["time"],
+            data["event"],
+            group,
+            n_boot=args.bootstrap,
+            alpha=args.alpha,
+            jobs=args.jobs,
+            seed=args.seed,
+        )
+
+    plot_survival(curves, Path(args.output), bands)
+    print(f"Figure written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
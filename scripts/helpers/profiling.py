@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Profiling and Tracing for the Grant Tools
+
+Shared instrumentation for validate.py, reference_formatter.py,
+quick_start.py and generate_workflow_diagram.py. Hot paths are wrapped in
+nested, timed spans:
+
+    from profiling import span, traced
+
+    with span("pdf.parse", file=str(path)):
+        ...
+
+    @traced("bib.parse")
+    def parse_bibtex(content): ...
+
+Tracing is off by default; span() then returns a shared no-op context
+manager, so instrumented code costs one function call and a flag check.
+It is switched on by the NIH_PROFILE environment variable or a tool's
+--profile option:
+
+    NIH_PROFILE=1 python tools/validate.py outputs/grant.pdf
+    python tools/validate.py outputs/grant.pdf --profile-out trace.json --cprofile validate.prof
+
+Spans are written on exit as a Chrome trace (open in chrome://tracing or
+https://ui.perfetto.dev) and summarized on stderr. NIH_PROFILE_CPROFILE
+(or --cprofile) additionally dumps cProfile statistics for the whole run,
+readable with `python -m pstats` or snakeviz.
+
+Child processes started after profiling is enabled record spans too; a
+worker returns them with collect() and the parent adds them with merge().
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+PROFILE_DIR = ROOT_DIR / "outputs" / "profiles"
+ENV_VAR = "NIH_PROFILE"
+CPROFILE_ENV_VAR = "NIH_PROFILE_CPROFILE"
+WORKER_ENV_VAR = "NIH_PROFILE_WORKER"
+
+# Output files must carry these suffixes, so a mistyped path never
+# overwrites an input file when the results are written at exit
+TRACE_SUFFIX = ".json"
+CPROFILE_SUFFIXES = (".prof", ".pstats")
+
+_NULL_SPAN = nullcontext()
+_enabled = os.environ.get(WORKER_ENV_VAR) == "1"
+_events: List[Dict] = []
+_lock = threading.Lock()
+
+
+class _Span:
+    """Records one complete ("X") trace event when it exits"""
+
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: Dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        event = {
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start / 1000,  # monotonic clock, comparable across processes
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {key: str(value) for key, value in self.args.items()},
+        }
+        if exc_type is not None:
+            event["args"]["error"] = exc_type.__name__
+        with _lock:
+            _events.append(event)
+        return False
+
+
+def span(name: str, **args):
+    """Context manager timing a block as a named span (no-op when disabled)"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator timing every call of a function as a span"""
+
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(label, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def is_enabled() -> bool:
+    """Whether spans are being recorded"""
+    return _enabled
+
+
+def enable(
+    tool: str, trace_path: Optional[Path] = None, cprofile_path: Optional[Path] = None
+) -> Path:
+    """Start recording spans; the trace is written when the process exits
+
+    Returns the trace file path. Defaults to outputs/profiles/<tool>-<time>.trace.json.
+    Raises ValueError if the trace path does not end in .json or the cProfile
+    path in .prof/.pstats.
+    """
+    global _enabled
+    if trace_path is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        trace_path = PROFILE_DIR / f"{tool}-{stamp}.trace.json"
+    trace_path = Path(trace_path)
+    if trace_path.suffix != TRACE_SUFFIX:
+        raise ValueError(f"Trace file must end in {TRACE_SUFFIX}: {trace_path}")
+    if cprofile_path and Path(cprofile_path).suffix not in CPROFILE_SUFFIXES:
+        raise ValueError(
+            f"cProfile file must end in {' or '.join(CPROFILE_SUFFIXES)}: {cprofile_path}"
+        )
+
+    profiler = None
+    if cprofile_path:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    _enabled = True
+    os.environ[WORKER_ENV_VAR] = "1"
+    atexit.register(_finish, tool, trace_path, profiler, cprofile_path)
+    return trace_path
+
+
+def _finish(tool: str, trace_path: Path, profiler, cprofile_path) -> None:
+    """Write the trace, cProfile dump and summary at exit"""
+    if profiler is not None:
+        profiler.disable()
+        Path(cprofile_path).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(cprofile_path))
+        print(f"cProfile stats written to {cprofile_path}", file=sys.stderr)
+
+    write_trace(trace_path, tool)
+    print(summary(), file=sys.stderr)
+    print(f"Trace written to {trace_path}", file=sys.stderr)
+
+
+def collect() -> List[Dict]:
+    """Remove and return the spans recorded by this process (call in a worker)"""
+    global _events
+    pid = os.getpid()
+    with _lock:
+        mine = [event for event in _events if event["pid"] == pid]
+        _events = [event for event in _events if event["pid"] != pid]
+    return mine
+
+
+def merge(events: List[Dict]) -> None:
+    """Add spans collected from a worker process"""
+    with _lock:
+        _events.extend(events)
+
+
+def write_trace(path: Path, tool: str = "") -> None:
+    """Write recorded spans in Chrome trace event format"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        events = sorted(_events, key=lambda event: event["ts"])
+    names = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": tool if pid == os.getpid() else f"{tool} worker"},
+        }
+        for pid in sorted({event["pid"] for event in events} | {os.getpid()})
+    ]
+    trace = {
+        "traceEvents": names + events,
+        "displayTimeUnit": "ms",
+    }
+    path.write_text(json.dumps(trace))
+
+
+def summary(limit: int = 20) -> str:
+    """Total and self time per span name, slowest first"""
+    with _lock:
+        events = list(_events)
+
+    totals: Dict[str, List[float]] = {}
+    for event in events:
+        entry = totals.setdefault(event["name"], [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += event["dur"]
+        entry[2] += event["dur"]
+
+    # Self time: subtract the spans directly nested inside each span
+    stacks: Dict[tuple, List[Dict]] = {}
+    for event in sorted(events, key=lambda e: (e["pid"], e["tid"], e["ts"], -e["dur"])):
+        stack = stacks.setdefault((event["pid"], event["tid"]), [])
+        while stack and event["ts"] >= stack[-1]["ts"] + stack[-1]["dur"]:
+            stack.pop()
+        if stack:
+            totals[stack[-1]["name"]][2] -= event["dur"]
+        stack.append(event)
+
+    lines = [f"{'span':<40} {'calls':>7} {'total ms':>10} {'self ms':>10}"]
+    for name, (calls, total, own) in sorted(
+        totals.items(), key=lambda item: item[1][1], reverse=True
+    )[:limit]:
+        lines.append(f"{name:<40} {calls:>7} {total / 1000:>10.1f} {own / 1000:>10.1f}")
+    return "\n".join(lines)
+
+
+def add_profile_arguments(parser) -> None:
+    """Add --profile, --profile-out and --cprofile options to an argparse parser"""
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"Record timing spans to a Chrome trace in {PROFILE_DIR.relative_to(ROOT_DIR)}/",
+    )
+    parser.add_argument(
+        "--profile-out",
+        metavar="TRACE.json",
+        help="Record timing spans to this Chrome trace file (implies --profile)",
+    )
+    parser.add_argument(
+        "--cprofile", metavar="FILE.prof", help="Also dump cProfile statistics to FILE.prof"
+    )
+
+
+def setup(tool: str, args=None) -> Optional[Path]:
+    """Enable profiling from parsed --profile/--profile-out/--cprofile options or the environment
+
+    NIH_PROFILE may be "1" (default trace location) or a .json trace file path.
+    Returns the trace path, or None if profiling stays off. Exits with an
+    error for output paths without a .json (trace) or .prof (cProfile) suffix.
+    """
+    trace = getattr(args, "profile_out", None)
+    if trace is None and getattr(args, "profile", False):
+        trace = ""
+    cprofile_path = getattr(args, "cprofile", None) or os.environ.get(CPROFILE_ENV_VAR)
+
+    if trace is None:
+        env = os.environ.get(ENV_VAR, "")
+        if env.lower() in ("", "0", "false", "no"):
+            if not cprofile_path:
+                return None
+            trace = ""
+        else:
+            trace = "" if env.lower() in ("1", "true", "yes") else env
+
+    try:
+        return enable(tool, Path(trace) if trace else None, cprofile_path)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
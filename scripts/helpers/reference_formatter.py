@@ -10,17 +10,62 @@ Usage:
     python reference_formatter.py input.bib --output refs.txt --format nih
     python reference_formatter.py input.bib --check-duplicates
     python reference_formatter.py --extract-citations document.typ
+    python reference_formatter.py library.bib --prune my_grants/my_r01 --output refs.yml
 
 Author: Your Name
 Date: 2025-05-22
 """
 
 import argparse
+import hashlib
+import json
 import re
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 
+from profiling import add_profile_arguments, setup as setup_profiling, span, traced
+
+# Bumped when the pruned output format changes, so existing files are rewritten
+PRUNE_VERSION = 1
+PRUNE_HEADER = "nih-grant-bibliography"
+
+# Typst imports/includes whose citations count towards a grant
+TYPST_DEPENDENCY = re.compile(r'#(?:import|include)\s+"([^"@][^"]*\.typ)"')
+
+# BibTeX field order in cleaned output; other fields follow alphabetically
+BIBTEX_FIELD_ORDER = [
+    "author", "editor", "title", "journal", "booktitle", "year", "month",
+    "volume", "number", "pages", "publisher", "address", "doi", "url",
+]
+
+MONTHS = {
+    name: f"{number:02d}"
+    for number, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1
+    )
+}
+
+# BibTeX entry type -> (Hayagriva type, parent type for journal/booktitle)
+HAYAGRIVA_TYPES = {
+    "article": ("article", "periodical"),
+    "inproceedings": ("article", "proceedings"),
+    "conference": ("article", "proceedings"),
+    "incollection": ("chapter", "book"),
+    "inbook": ("chapter", "book"),
+    "book": ("book", None),
+    "phdthesis": ("thesis", None),
+    "mastersthesis": ("thesis", None),
+    "techreport": ("report", None),
+    "online": ("web", None),
+    "misc": ("misc", None),
+}
+
+LATEX_REPLACEMENTS = [
+    (r"\\&", "&"), (r"\\%", "%"), (r"\\_", "_"), (r"\\\$", "$"),
+    (r"---", "\u2014"), (r"--", "\u2013"), (r"~", " "),
+]
+
 
 class BibEntry:
     """Class representing a bibliographic entry."""
@@ -56,6 +101,81 @@ class BibEntry:
             # Assume the last word is the last name
             return first_author.split()[-1].strip()
 
+    def clean_field(self, name: str) -> str:
+        """Field value without its outer braces/quotes and with whitespace collapsed"""
+        value = self.fields.get(name, "").strip()
+        if len(value) >= 2 and (value[0], value[-1]) in (("{", "}"), ('"', '"')):
+            value = value[1:-1]
+        return " ".join(value.split())
+
+    def plain_field(self, name: str) -> str:
+        """Field value as plain text, without LaTeX braces and escapes"""
+        value = self.clean_field(name)
+        for pattern, replacement in LATEX_REPLACEMENTS:
+            value = re.sub(pattern, replacement, value)
+        return value.replace("{", "").replace("}", "")
+
+    def to_bibtex(self) -> str:
+        """Normalized BibTeX: one field per line, in a fixed order"""
+        names = sorted(
+            self.fields,
+            key=lambda f: (BIBTEX_FIELD_ORDER.index(f) if f in BIBTEX_FIELD_ORDER else 99, f),
+        )
+        lines = [f"@{self.entry_type}{{{self.key},"]
+        for name in names:
+            value = self.clean_field(name)
+            if value:
+                lines.append(f"  {name} = {{{value}}},")
+        lines.append("}")
+        return "\n".join(lines)
+
+    def to_hayagriva(self) -> Dict:
+        """Entry as a Hayagriva (Typst native bibliography) mapping"""
+        entry_type, parent_type = HAYAGRIVA_TYPES.get(self.entry_type, ("misc", None))
+        entry = {"type": entry_type, "title": self.plain_field("title")}
+        parent = {}
+
+        authors = [" ".join(a.replace("{", "").replace("}", "").split()) for a in self.get_author_list()]
+        if authors:
+            entry["author"] = authors
+        if self.fields.get("editor"):
+            editors = self.plain_field("editor").split(" and ")
+            (parent if parent_type else entry)["editor"] = [e.strip() for e in editors]
+
+        year = self.clean_field("year")
+        month = MONTHS.get(self.clean_field("month").lower()[:3], "")
+        if year:
+            entry["date"] = f"{year}-{month}" if month else year
+
+        container = self.plain_field("journal") or self.plain_field("booktitle")
+        if parent_type and container:
+            parent.update(type=parent_type, title=container)
+
+        # Volume and issue belong to the journal for articles
+        volume_target = parent if parent_type == "periodical" and parent else entry
+        for field, key, target in [
+            ("volume", "volume", volume_target),
+            ("number", "issue", volume_target),
+            ("pages", "page-range", entry),
+            ("edition", "edition", entry),
+            ("publisher", "publisher", parent if parent_type == "book" and parent else entry),
+            ("address", "location", entry),
+            ("organization", "organization", entry),
+            ("school", "organization", entry),
+            ("institution", "organization", entry),
+            ("doi", "doi", entry),
+            ("url", "url", entry),
+            ("isbn", "isbn", entry),
+            ("note", "note", entry),
+        ]:
+            value = self.plain_field(field)
+            if value and key not in target:
+                target[key] = value.replace("\u2013", "-") if key == "page-range" else value
+
+        if parent:
+            entry["parent"] = parent
+        return entry
+
     def format_nih_style(self) -> str:
         """Format the reference in NIH style."""
         try:
@@ -95,6 +215,7 @@ class BibEntry:
             return f"Error formatting reference {self.key}: {str(e)}"
 
 
+@traced("bib.parse")
 def parse_bibtex(content: str) -> List[BibEntry]:
     """Parse BibTeX content into BibEntry objects."""
     entries = []
@@ -129,7 +250,7 @@ def parse_bibtex(content: str) -> List[BibEntry]:
                 current_value.append(field_parts[1].strip())
             else:
                 # Continue previous field
-                current_value.append(line)
+                current_value.append(" " + line)
 
             # Track brace nesting
             in_braces += line.count("{") - line.count("}")
@@ -143,6 +264,7 @@ def parse_bibtex(content: str) -> List[BibEntry]:
     return entries
 
 
+@traced("bib.duplicates")
 def find_duplicate_references(
     entries: List[BibEntry],
 ) -> List[Tuple[BibEntry, BibEntry]]:
@@ -163,11 +285,127 @@ def find_duplicate_references(
     return duplicates
 
 
+@traced("citations.extract")
+def _without_strings(typst_content: str) -> str:
+    """Typst source with string literals (import specs, file names) blanked out"""
+    return re.sub(r'"(?:[^"\\\n]|\\.)*"', '""', typst_content)
+
+
+def extract_labels(typst_content: str) -> Set[str]:
+    """Labels defined in a Typst document, e.g. <fig-aims>"""
+    # A label follows content; <key> right after "(" is a cite/ref argument
+    return set(re.findall(r"(?<![(\w])<([a-zA-Z0-9_:.-]+)>", _without_strings(typst_content)))
+
+
 def extract_citations(typst_content: str) -> Set[str]:
-    """Extract citation keys from a Typst document."""
-    # Find all citation keys in the format @key or @key[page]
-    citation_pattern = re.compile(r"@([a-zA-Z0-9_-]+)(?:\[\d+\])?")
-    return set(citation_pattern.findall(typst_content))
+    """Extract citation keys from a Typst document.
+
+    References to labels defined in the same document (@fig-1) are not
+    citations and are left out; collect_grant_citations also removes
+    labels defined in other files of the grant.
+    """
+    content = _without_strings(typst_content)
+    # Find all citation keys in the format @key or @key[page], but not emails
+    citation_pattern = re.compile(
+        r"(?<![\w.@])@([a-zA-Z0-9_-]+(?:[:.][a-zA-Z0-9_-]+)*)(?:\[\d+\])?"
+    )
+    # ... and in the form #cite(<key>)
+    cite_pattern = re.compile(r"#cite\(\s*<([^>]+)>")
+    citations = set(citation_pattern.findall(content)) | set(cite_pattern.findall(content))
+    return citations - extract_labels(typst_content)
+
+
+@traced("citations.collect")
+def collect_grant_citations(grant: Path) -> Tuple[Set[str], List[Path]]:
+    """Citation keys used by a grant, following #import and #include
+
+    ``grant`` is a grant directory (all of its .typ files) or a single main
+    .typ file. Returns the keys and the Typst files that were read.
+    """
+    pending = sorted(grant.rglob("*.typ")) if grant.is_dir() else [grant]
+    seen = set()
+    citations = set()
+    labels = set()
+    while pending:
+        path = pending.pop().resolve()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        content = path.read_text(encoding="utf-8")
+        citations |= extract_citations(content)
+        labels |= extract_labels(content)
+        pending.extend(path.parent / target for target in TYPST_DEPENDENCY.findall(content))
+    # @fig-aims in one file may refer to a figure labelled in another
+    return citations - labels, sorted(seen)
+
+
+def prune_entries(entries: List[BibEntry], cited: Set[str]) -> List[BibEntry]:
+    """Entries whose keys are cited, sorted by key (first occurrence wins)"""
+    selected = {}
+    for entry in entries:
+        if entry.key in cited and entry.key not in selected:
+            selected[entry.key] = entry
+    return [selected[key] for key in sorted(selected)]
+
+
+def _hayagriva_yaml(entries: List[BibEntry]) -> str:
+    """Hayagriva YAML; strings are emitted JSON-quoted, which YAML accepts"""
+
+    def emit(value, indent: int) -> List[str]:
+        pad = "  " * indent
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, dict):
+                lines.append(f"{pad}{key}:")
+                lines.extend(emit(item, indent + 1))
+            elif isinstance(item, list):
+                lines.append(f"{pad}{key}:")
+                lines.extend(f"{pad}  - {json.dumps(v, ensure_ascii=False)}" for v in item)
+            else:
+                lines.append(f"{pad}{key}: {json.dumps(str(item), ensure_ascii=False)}")
+        return lines
+
+    blocks = []
+    for entry in entries:
+        blocks.append("\n".join([f"{json.dumps(entry.key)}:"] + emit(entry.to_hayagriva(), 1)))
+    return "\n\n".join(blocks) + "\n"
+
+
+def render_pruned_bibliography(entries: List[BibEntry], output_format: str) -> str:
+    """Pruned bibliography text ("bibtex" or "hayagriva"), without the header"""
+    if output_format == "hayagriva":
+        return _hayagriva_yaml(entries)
+    return "\n\n".join(entry.to_bibtex() for entry in entries) + "\n"
+
+
+@traced("bib.prune")
+def write_pruned_bibliography(
+    entries: List[BibEntry], cited: Set[str], output: Path
+) -> Tuple[List[BibEntry], bool]:
+    """Write only the cited entries, unless the output is already current
+
+    The format follows the output suffix: .yml/.yaml for Hayagriva, anything
+    else for cleaned BibTeX. A hash of the selected entries is stored in the
+    first line, and the file is left untouched (mtime included) when it
+    matches, so Typst only sees a change when citations or entries change.
+    Returns the selected entries and whether the file was written.
+    """
+    output_format = "hayagriva" if output.suffix in (".yml", ".yaml") else "bibtex"
+    selected = prune_entries(entries, cited)
+    body = render_pruned_bibliography(selected, output_format)
+
+    digest = hashlib.sha256(f"{PRUNE_VERSION}\n{body}".encode()).hexdigest()
+    comment = "#" if output_format == "hayagriva" else "%"
+    header = f"{comment} {PRUNE_HEADER}: {digest} ({len(selected)} entries, generated by reference_formatter.py)"
+
+    if output.exists():
+        with open(output, "r", encoding="utf-8") as f:
+            if f.readline().startswith(f"{comment} {PRUNE_HEADER}: {digest} "):
+                return selected, False
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(f"{header}\n\n{body}", encoding="utf-8")
+    return selected, True
 
 
 def main():
@@ -193,19 +431,28 @@ def main():
         metavar="FILE",
         help="Extract citation keys from a Typst document",
     )
+    parser.add_argument(
+        "--prune",
+        metavar="GRANT",
+        help="Write only the entries cited by a grant (directory or main .typ file)",
+    )
     parser.add_argument(
         "--sort",
         choices=["first-author", "year", "key"],
         help="Sort references by given criteria",
     )
 
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
+    setup_profiling("reference_formatter", args)
 
     # Extract citations from Typst document
     if args.extract_citations:
         try:
-            with open(args.extract_citations, "r", encoding="utf-8") as f:
-                content = f.read()
+            with span("file.read", file=args.extract_citations):
+                with open(args.extract_citations, "r", encoding="utf-8") as f:
+                    content = f.read()
 
             citations = extract_citations(content)
             print(f"Found {len(citations)} unique citations:")
@@ -216,6 +463,41 @@ def main():
             print(f"Error extracting citations: {str(e)}", file=sys.stderr)
             sys.exit(1)
 
+    # Write a pruned bibliography for a grant
+    if args.prune:
+        grant = Path(args.prune)
+        grant_dir = grant if grant.is_dir() else grant.parent
+        bib_files = (
+            [Path(args.input_file)] if args.input_file else sorted(grant_dir.rglob("*.bib"))
+        )
+        output = Path(args.output) if args.output else grant_dir / "references.cited.yml"
+        bib_files = [path for path in bib_files if path.resolve() != output.resolve()]
+
+        try:
+            cited, typ_files = collect_grant_citations(grant)
+            entries = []
+            for bib_file in bib_files:
+                with span("file.read", file=str(bib_file)):
+                    content = bib_file.read_text(encoding="utf-8")
+                entries.extend(parse_bibtex(content))
+            selected, written = write_pruned_bibliography(entries, cited, output)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Error pruning bibliography: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+
+        print(
+            f"{len(cited)} citations in {len(typ_files)} Typst files; "
+            f"{len(selected)} of {len(entries)} entries kept",
+            file=sys.stderr,
+        )
+        for key in sorted(cited - {entry.key for entry in selected}):
+            print(f"  Missing bibliography entry: {key}", file=sys.stderr)
+        print(
+            f"{'Wrote' if written else 'Unchanged:'} {output}",
+            file=sys.stderr,
+        )
+        return
+
     # Check if input file is provided for other operations
     if not args.input_file:
         parser.print_help()
@@ -223,8 +505,9 @@ def main():
 
     # Read and parse input file
     try:
-        with open(args.input_file, "r", encoding="utf-8") as f:
-            content = f.read()
+        with span("file.read", file=args.input_file):
+            with open(args.input_file, "r", encoding="utf-8") as f:
+                content = f.read()
 
         entries = parse_bibtex(content)
         print(
@@ -267,10 +550,11 @@ def main():
 
         # Format references
         formatted = []
-        for entry in entries:
-            if args.format == "nih":
-                formatted.append(entry.format_nih_style())
-            # Add other format options as needed
+        with span("bib.format", format=args.format, entries=len(entries)):
+            for entry in entries:
+                if args.format == "nih":
+                    formatted.append(entry.format_nih_style())
+                # Add other format options as needed
 
         # Output
         output = "\n\n".join(formatted)
@@ -2,6 +2,7 @@
   title: "Title of R03 Grant Application",
   pi: "Principal Investigator",
   institution: "Research Institution",
+  title-block: true,
   body
 ) = {
   // Page setup for NIH grants
@@ -29,14 +30,16 @@
     it
   }
 
-  // Title block
-  align(center)[
-    #text(weight: "bold", size: 14pt)[#title]
-    #v(0.5em)
-    #text(style: "italic")[#pi, #institution]
-    #v(1em)
-    #line(length: 100%)
-  ]
+  // Title block (disabled when sections are compiled on their own)
+  if title-block {
+    align(center)[
+      #text(weight: "bold", size: 14pt)[#title]
+      #v(0.5em)
+      #text(style: "italic")[#pi, #institution]
+      #v(1em)
+      #line(length: 100%)
+    ]
+  }
 
   // Document body
   body
@@ -21,21 +21,71 @@
   it
 }
 
+// Budget figures generated by tools/budget_calculator.py
+#import "budget_data.typ": budget_data
+
+// Format a dollar amount with thousands separators
+#let money(amount) = {
+  let digits = str(int(calc.round(amount)))
+  let groups = ()
+  while digits.len() > 3 {
+    groups.insert(0, digits.slice(digits.len() - 3))
+    digits = digits.slice(0, digits.len() - 3)
+  }
+  groups.insert(0, digits)
+  "$" + groups.join(",")
+}
+
+// Effort of a person in the budget data, as a percentage. Falls back to the
+// given text when the budget data (e.g. from a custom --inputs file) has no
+// person of that name.
+#let effort(name, fallback) = {
+  let person = budget_data.personnel.find(p => p.name == name)
+  if person == none { fallback } else { str(calc.round(person.effort * 100)) + "%" }
+}
+
+// Summary table of the budget by category and year
+#let budget_table = {
+  let years = budget_data.years
+  let totals = ("Total Direct Costs", "Modular Direct Costs", "Total Costs")
+  table(
+    columns: (2fr,) + years.map(_ => 1fr) + (1fr,),
+    align: (left,) + years.map(_ => right) + (right,),
+    stroke: 0.5pt,
+    table.header([*Category*], ..years.map(y => [*Year #y*]), [*Total*]),
+    ..budget_data.rows.map(row => {
+      let cell(body) = if row.name in totals { strong(body) } else { body }
+      (cell(row.name), ..row.amounts.map(a => cell(money(a))), cell(money(row.total)))
+    }).flatten(),
+  )
+}
+
 #let budget_example = [
   This five-year R01 project requires the following resources to accomplish the proposed aims:
 
+  #budget_table
+
+  #if budget_data.budget_type == "modular" [
+    A modular budget of #budget_data.modules.map(str).join(", ") modules of \$25,000 in years
+    #budget_data.years.map(str).join(", ") is requested.
+  ] else [
+    A detailed budget is requested; salaries are capped at the NIH salary cap of
+    #money(budget_data.salary_cap) and escalate #str(calc.round(budget_data.escalation * 100, digits: 1))% per year,
+    with F&A at #str(calc.round(budget_data.fa_rate * 100))% of modified total direct costs.
+  ]
+
   == PERSONNEL
 
-  *Principal Investigator (Dr. Jane Smith, 25% effort):* Dr. Smith will provide overall scientific
+  *Principal Investigator (Dr. Jane Smith, #effort("Dr. Jane Smith", "25%") effort):* Dr. Smith will provide overall scientific
   leadership for the project, oversee all aspects of study design, data collection, analysis, and
   dissemination. She will supervise research staff and ensure adherence to timelines and research
   protocols.
 
-  *Co-Investigator (Dr. Robert Johnson, 15% effort):* Dr. Johnson will contribute expertise in
+  *Co-Investigator (Dr. Robert Johnson, #effort("Dr. Robert Johnson", "15%") effort):* Dr. Johnson will contribute expertise in
   neuroimaging methods and analysis, assist with fMRI protocol development, and supervise the
   neuroimaging data processing pipeline.
 
-  *Co-Investigator (Dr. Sarah Williams, 10% effort):* Dr. Williams will contribute expertise in
+  *Co-Investigator (Dr. Sarah Williams, #effort("Dr. Sarah Williams", "10%") effort):* Dr. Williams will contribute expertise in
   developmental psychopathology, assist with clinical assessments, and help interpret findings in
   the context of neurodevelopmental disorders.
 
@@ -47,7 +97,7 @@
   administer cognitive and clinical assessments, assist with neuroimaging data collection, and
   manage research databases.
 
-  *MRI Technician (25% effort):* A certified MRI technician will operate the MRI scanner during
+  *MRI Technician (#effort("MRI Technician", "25%") effort):* A certified MRI technician will operate the MRI scanner during
   data collection and ensure high-quality neuroimaging data.
 
   == EQUIPMENT
@@ -0,0 +1,106 @@
+// Generated by tools/budget_calculator.py; edit inputs there, not here
+#let budget_data = (
+  budget_type: "detailed",
+  years: (1, 2, 3, 4, 5),
+  salary_cap: 225700,
+  escalation: 0.03,
+  fa_rate: 0.55,
+  modules: (),
+  personnel: (
+    (
+      name: "Dr. Jane Smith",
+      role: "Principal Investigator",
+      count: 1,
+      effort: 0.25,
+      months: 3.0,
+      salary: (45000, 46350, 47740, 49173, 50648),
+    ),
+    (
+      name: "Dr. Robert Johnson",
+      role: "Co-Investigator",
+      count: 1,
+      effort: 0.15,
+      months: 1.8,
+      salary: (24000, 24720, 25462, 26225, 27012),
+    ),
+    (
+      name: "Dr. Sarah Williams",
+      role: "Co-Investigator",
+      count: 1,
+      effort: 0.1,
+      months: 1.2,
+      salary: (15000, 15450, 15914, 16391, 16883),
+    ),
+    (
+      name: "Postdoctoral Researcher",
+      role: "Postdoc",
+      count: 2,
+      effort: 1.0,
+      months: 12.0,
+      salary: (122016, 125676, 129447, 133330, 137330),
+    ),
+    (
+      name: "Research Assistant",
+      role: "Research Assistant",
+      count: 2,
+      effort: 1.0,
+      months: 12.0,
+      salary: (90000, 92700, 95481, 98345, 101296),
+    ),
+    (
+      name: "MRI Technician",
+      role: "Technician",
+      count: 1,
+      effort: 0.25,
+      months: 3.0,
+      salary: (17500, 18025, 18566, 19123, 19696),
+    ),
+  ),
+  rows: (
+    (
+      name: "Personnel (salary + fringe)",
+      amounts: (401470, 413514, 425920, 438697, 451858),
+      total: 2131459,
+    ),
+    (
+      name: "Equipment",
+      amounts: (125000, 0, 0, 0, 0),
+      total: 125000,
+    ),
+    (
+      name: "Supplies",
+      amounts: (30000, 30000, 30000, 30000, 30000),
+      total: 150000,
+    ),
+    (
+      name: "Travel",
+      amounts: (20000, 20000, 20000, 20000, 20000),
+      total: 100000,
+    ),
+    (
+      name: "Participant Costs",
+      amounts: (70000, 70000, 70000, 70000, 70000),
+      total: 350000,
+    ),
+    (
+      name: "Other Direct Costs",
+      amounts: (145000, 145000, 145000, 145000, 145000),
+      total: 725000,
+    ),
+    (
+      name: "Total Direct Costs",
+      amounts: (791470, 678514, 690920, 703697, 716858),
+      total: 3581459,
+    ),
+    (
+      name: "F&A Costs",
+      amounts: (328058, 334683, 341506, 348533, 355772),
+      total: 1708552,
+    ),
+    (
+      name: "Total Costs",
+      amounts: (1119528, 1013197, 1032425, 1052231, 1072630),
+      total: 5290011,
+    ),
+  ),
+)
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+NIH Grant Budget Scenario Calculator
+
+Evaluates many budget scenarios at once and writes the chosen one as Typst
+data for templates/shared/budget.typ:
+- Scenarios are the cartesian product of per-person effort levels, salary
+  escalation rates, F&A rates and salary caps
+- All scenarios are computed together as NumPy arrays (scenario x person x year)
+- Salaries are capped at the NIH salary cap before effort is applied
+- Modular budgets are requested in $25,000 modules and are only allowed when
+  direct costs stay at or below $250,000 in every year
+
+Usage:
+    python tools/budget_calculator.py
+    python tools/budget_calculator.py --effort "Dr. Jane Smith=0.2,0.25,0.3" \\
+        --escalation 0.02,0.03 --fa-rate 0.5,0.55 --max-annual-direct 500000
+"""
+
+import sys
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).parent.parent
+OUTPUT_FILE = ROOT_DIR / "templates" / "shared" / "budget_data.typ"
+
+YEARS = 5
+NIH_SALARY_CAP = 225_700  # Executive Level II, 2025
+MODULE_SIZE = 25_000
+MODULAR_LIMIT = 250_000  # Direct costs per year
+
+# Default inputs, matching the budget justification in templates/shared/budget.typ.
+# Amounts for other costs are per year; categories excluded from MTDC carry no F&A.
+DEFAULT_INPUTS = {
+    "personnel": [
+        {"name": "Dr. Jane Smith", "role": "Principal Investigator", "base_salary": 180_000, "effort": 0.25, "fringe": 0.30},
+        {"name": "Dr. Robert Johnson", "role": "Co-Investigator", "base_salary": 160_000, "effort": 0.15, "fringe": 0.30},
+        {"name": "Dr. Sarah Williams", "role": "Co-Investigator", "base_salary": 150_000, "effort": 0.10, "fringe": 0.30},
+        {"name": "Postdoctoral Researcher", "role": "Postdoc", "base_salary": 61_008, "effort": 1.0, "fringe": 0.25, "count": 2},
+        {"name": "Research Assistant", "role": "Research Assistant", "base_salary": 45_000, "effort": 1.0, "fringe": 0.30, "count": 2},
+        {"name": "MRI Technician", "role": "Technician", "base_salary": 70_000, "effort": 0.25, "fringe": 0.30},
+    ],
+    "costs": [
+        {"name": "Equipment", "amounts": [125_000, 0, 0, 0, 0], "mtdc_excluded": True},
+        {"name": "Supplies", "amounts": [30_000] * YEARS},
+        {"name": "Travel", "amounts": [20_000] * YEARS},
+        {"name": "Participant Costs", "amounts": [70_000] * YEARS, "mtdc_excluded": True},
+        {"name": "Other Direct Costs", "amounts": [145_000] * YEARS},
+    ],
+    "escalation": 0.03,
+    "fa_rate": 0.55,
+    "salary_cap": NIH_SALARY_CAP,
+}
+
+
+# Allowed (low, high) values; fractions are of salary or of direct costs
+LIMITS = {
+    "effort": (0.0, 1.0),
+    "fringe": (0.0, 1.0),
+    "escalation": (0.0, 1.0),
+    "fa_rate": (0.0, 1.0),
+    "salary_cap": (1.0, None),
+    "base_salary": (0.0, None),
+    "amount": (0.0, None),
+}
+
+
+def check_value(value, field: str, where: str) -> float:
+    """A number within LIMITS[field]; raises ValueError naming ``where`` otherwise"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{where}: {field} must be a number, got {value!r}")
+    low, high = LIMITS[field]
+    if value < low or (high is not None and value > high):
+        bounds = f"between {low:g} and {high:g}" if high is not None else f"at least {low:g}"
+        raise ValueError(f"{where}: {field} must be {bounds}, got {value:g}")
+    return float(value)
+
+
+def load_inputs(path: Path) -> Dict:
+    """Read a budget inputs file
+
+    "personnel" and "costs" are required and replace the example grant's
+    entirely; "escalation", "fa_rate" and "salary_cap" default to the
+    example values. Raises ValueError describing the first problem found.
+    """
+    try:
+        data = json.loads(Path(path).read_text())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read {path}: {e}")
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+
+    unknown = set(data) - set(DEFAULT_INPUTS)
+    if unknown:
+        raise ValueError(f"{path}: unknown keys: {', '.join(sorted(unknown))}")
+    for key in ("personnel", "costs"):
+        if not data.get(key):
+            raise ValueError(f'{path}: "{key}" is required (it is not merged with the example)')
+
+    for i, person in enumerate(data["personnel"]):
+        where = f"{path}: personnel[{i}]"
+        missing = [k for k in ("name", "role", "base_salary", "effort") if k not in person]
+        if missing:
+            raise ValueError(f"{where} is missing {', '.join(missing)}")
+        for field in ("base_salary", "effort", "fringe"):
+            if field in person:
+                check_value(person[field], field, where)
+        count = person.get("count", 1)
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            raise ValueError(f"{where}: count must be a positive whole number, got {count!r}")
+    for i, cost in enumerate(data["costs"]):
+        where = f"{path}: costs[{i}]"
+        if "name" not in cost or "amounts" not in cost:
+            raise ValueError(f"{where} needs a name and amounts")
+        if not isinstance(cost["amounts"], list) or len(cost["amounts"]) != YEARS:
+            raise ValueError(f"{where} ({cost['name']}) needs {YEARS} yearly amounts")
+        for amount in cost["amounts"]:
+            check_value(amount, "amount", f"{where} ({cost['name']})")
+    for field in ("escalation", "fa_rate", "salary_cap"):
+        if field in data:
+            check_value(data[field], field, str(path))
+
+    return {**DEFAULT_INPUTS, **data}
+
+
+def scenario_grid(inputs: Dict, axes: Dict[str, List[float]]) -> Dict[str, np.ndarray]:
+    """Cartesian product of scenario parameters
+
+    ``axes`` maps "effort:<person index>", "escalation", "fa_rate" and
+    "salary_cap" to candidate values; parameters without an axis keep their
+    input value. Returns one flat array per parameter, all of length N.
+    """
+    people = inputs["personnel"]
+    values = {f"effort:{i}": [person["effort"]] for i, person in enumerate(people)}
+    values.update(
+        escalation=[inputs["escalation"]],
+        fa_rate=[inputs["fa_rate"]],
+        salary_cap=[inputs["salary_cap"]],
+    )
+    values.update(axes)
+
+    mesh = np.meshgrid(*(np.asarray(v, dtype=float) for v in values.values()), indexing="ij")
+    grid = {name: m.ravel() for name, m in zip(values, mesh)}
+    grid["effort"] = np.stack([grid.pop(f"effort:{i}") for i in range(len(people))], axis=1)
+    return grid
+
+
+def evaluate(inputs: Dict, grid: Dict[str, np.ndarray], budget_type: str = "auto") -> Dict[str, np.ndarray]:
+    """Compute every scenario's budget (arrays of shape N x YEARS unless noted)"""
+    people = inputs["personnel"]
+    salary = np.array([p["base_salary"] for p in people], dtype=float)  # (P,)
+    fringe = np.array([p.get("fringe", 0.0) for p in people])
+    count = np.array([p.get("count", 1) for p in people], dtype=float)
+
+    costs = np.array([c["amounts"] for c in inputs["costs"]], dtype=float)  # (C, Y)
+    excluded = np.array([c.get("mtdc_excluded", False) for c in inputs["costs"]])
+
+    # Salary for each scenario, person and year, capped before applying effort
+    growth = (1 + grid["escalation"][:, None]) ** np.arange(YEARS)  # (N, Y)
+    base = salary[None, :, None] * growth[:, None, :]  # (N, P, Y)
+    capped = np.minimum(base, grid["salary_cap"][:, None, None])
+    requested = capped * (grid["effort"] * count)[:, :, None]
+    personnel = requested * (1 + fringe)[None, :, None]  # (N, P, Y)
+
+    direct = personnel.sum(axis=1) + costs.sum(axis=0)  # (N, Y)
+    mtdc = direct - costs[excluded].sum(axis=0)
+    fa = grid["fa_rate"][:, None] * mtdc
+
+    modules = np.ceil(direct / MODULE_SIZE)
+    eligible = (direct <= MODULAR_LIMIT).all(axis=1)  # (N,)
+    if budget_type == "auto":
+        modular = eligible
+    else:
+        modular = np.full(len(direct), budget_type == "modular")
+
+    requested_direct = np.where(modular[:, None], modules * MODULE_SIZE, direct)
+    return {
+        "salary": requested,
+        "personnel": personnel,
+        "costs": np.broadcast_to(costs, (len(direct),) + costs.shape),
+        "direct": direct,
+        "mtdc": mtdc,
+        "modules": modules,
+        "modular": modular,
+        "modular_eligible": eligible,
+        "requested_direct": requested_direct,
+        "fa": fa,
+        "total": requested_direct + fa,
+    }
+
+
+def select(
+    grid: Dict[str, np.ndarray],
+    results: Dict[str, np.ndarray],
+    max_annual_direct: Optional[float] = None,
+    max_total: Optional[float] = None,
+    target_total: Optional[float] = None,
+) -> np.ndarray:
+    """Indices of feasible scenarios, best first
+
+    Scenarios are feasible when modular budgets are eligible and the limits
+    hold. They are ranked by distance to ``target_total`` if given,
+    otherwise by most total effort and then lowest total cost.
+    """
+    total = results["total"].sum(axis=1)
+    feasible = ~results["modular"] | results["modular_eligible"]
+    if max_annual_direct is not None:
+        feasible &= (results["requested_direct"] <= max_annual_direct).all(axis=1)
+    if max_total is not None:
+        feasible &= total <= max_total
+
+    candidates = np.flatnonzero(feasible)
+    if target_total is not None:
+        order = np.argsort(np.abs(total[candidates] - target_total), kind="stable")
+    else:
+        effort = grid["effort"].sum(axis=1)
+        order = np.lexsort((total[candidates], -effort[candidates]))
+    return candidates[order]
+
+
+def _typst(value, indent: int = 0) -> str:
+    """Typst literal for a (nested) Python value"""
+    pad = "  " * indent
+    if isinstance(value, dict):
+        items = [f"{pad}  {key}: {_typst(item, indent + 1)}," for key, item in value.items()]
+        return "(\n" + "\n".join(items) + f"\n{pad})" if items else "(:)"
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return "(" + ", ".join(_typst(item) for item in value) + ("," if len(value) == 1 else "") + ")"
+        items = [f"{pad}  {_typst(item, indent + 1)}," for item in value]
+        return "(\n" + "\n".join(items) + f"\n{pad})"
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return repr(round(float(value), 4))
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def scenario_data(inputs: Dict, grid: Dict, results: Dict, index: int) -> Dict:
+    """One scenario as plain data for the Typst template"""
+    people = inputs["personnel"]
+    modular = bool(results["modular"][index])
+    personnel_rows = results["personnel"][index]  # (P, Y)
+
+    def row(name, amounts):
+        amounts = [int(round(a)) for a in amounts]
+        return {"name": name, "amounts": amounts, "total": sum(amounts)}
+
+    rows = [row("Personnel (salary + fringe)", personnel_rows.sum(axis=0))]
+    rows += [row(c["name"], c["amounts"]) for c in inputs["costs"]]
+    rows.append(row("Total Direct Costs", results["direct"][index]))
+    if modular:
+        rows.append(row("Modular Direct Costs", results["requested_direct"][index]))
+    rows.append(row("F&A Costs", results["fa"][index]))
+    rows.append(row("Total Costs", results["total"][index]))
+
+    return {
+        "budget_type": "modular" if modular else "detailed",
+        "years": list(range(1, YEARS + 1)),
+        "salary_cap": int(grid["salary_cap"][index]),
+        "escalation": float(grid["escalation"][index]),
+        "fa_rate": float(grid["fa_rate"][index]),
+        "modules": [int(m) for m in results["modules"][index]] if modular else [],
+        "personnel": [
+            {
+                "name": person["name"],
+                "role": person["role"],
+                "count": int(person.get("count", 1)),
+                "effort": float(grid["effort"][index, i]),
+                "months": round(float(grid["effort"][index, i]) * 12, 2),
+                "salary": [int(round(s)) for s in results["salary"][index, i]],
+            }
+            for i, person in enumerate(people)
+        ],
+        "rows": rows,
+    }
+
+
+def write_budget_data(data: Dict, output: Path = OUTPUT_FILE) -> None:
+    """Write scenario data as a Typst module defining `budget_data`"""
+    output.write_text(
+        "// Generated by tools/budget_calculator.py; edit inputs there, not here\n"
+        f"#let budget_data = {_typst(data)}\n",
+        encoding="utf-8",
+    )
+
+
+def _parse_values(text: str, field: str, option: str) -> List[float]:
+    """Comma-separated numbers within LIMITS[field]; raises ValueError otherwise"""
+    values = []
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        try:
+            value = float(item)
+        except ValueError:
+            raise ValueError(f"{option}: {item.strip()!r} is not a number")
+        values.append(check_value(value, field, option))
+    if not values:
+        raise ValueError(f"{option}: no values given")
+    return values
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Evaluate NIH budget scenarios and write the chosen one for budget.typ",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+ python tools/budget_calculator.py
+ python tools/budget_calculator.py --effort "Dr. Jane Smith=0.2,0.25,0.3" --fa-rate 0.5,0.55
+ python tools/budget_calculator.py --escalation 0,0.02,0.03 --max-annual-direct 500000 --list 10
+ python tools/budget_calculator.py --inputs my_budget.json --budget-type modular
+        """,
+    )
+
+    parser.add_argument(
+        "--inputs",
+        help="JSON file with personnel and costs; both replace the built-in example, "
+        "rates default to it",
+    )
+
+    parser.add_argument(
+        "--effort",
+        action="append",
+        default=[],
+        metavar="NAME=VALUES",
+        help="Effort levels to try for a person, as fractions (repeatable)",
+    )
+
+    parser.add_argument("--escalation", help="Annual salary escalation rates to try, e.g. 0.02,0.03")
+
+    parser.add_argument("--fa-rate", help="F&A rates to try, e.g. 0.5,0.55")
+
+    parser.add_argument("--salary-cap", help=f"Salary caps to try (default: {NIH_SALARY_CAP})")
+
+    parser.add_argument(
+        "--budget-type",
+        choices=["auto", "modular", "detailed"],
+        default="auto",
+        help="Modular, detailed, or modular whenever eligible (default: auto)",
+    )
+
+    parser.add_argument("--max-annual-direct", type=float, help="Maximum requested direct costs per year")
+
+    parser.add_argument("--max-total", type=float, help="Maximum total cost over all years")
+
+    parser.add_argument("--target-total", type=float, help="Prefer scenarios closest to this total cost")
+
+    parser.add_argument("--list", type=int, default=5, help="Number of best scenarios to show (default: 5)")
+
+    parser.add_argument("--choose", type=int, help="Scenario index to write (default: best)")
+
+    parser.add_argument("--output", default=str(OUTPUT_FILE), help="Typst data file to write")
+
+    parser.add_argument("--dry-run", action="store_true", help="Show scenarios without writing")
+
+    args = parser.parse_args()
+
+    inputs = DEFAULT_INPUTS
+    if args.inputs:
+        try:
+            inputs = load_inputs(Path(args.inputs))
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    names = [person["name"] for person in inputs["personnel"]]
+
+    axes = {}
+    try:
+        for spec in args.effort:
+            name, _, values = spec.partition("=")
+            if name not in names:
+                raise ValueError(f"--effort: unknown person {name!r} (known: {', '.join(names)})")
+            axes[f"effort:{names.index(name)}"] = _parse_values(values, "effort", f"--effort {name}")
+        for axis in ("escalation", "fa_rate", "salary_cap"):
+            if getattr(args, axis):
+                option = "--" + axis.replace("_", "-")
+                axes[axis] = _parse_values(getattr(args, axis), axis, option)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    grid = scenario_grid(inputs, axes)
+    results = evaluate(inputs, grid, args.budget_type)
+    ranked = select(grid, results, args.max_annual_direct, args.max_total, args.target_total)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    n = len(grid["escalation"])
+    print(f"Evaluated {n} scenario(s) in {elapsed_ms:.1f} ms; {len(ranked)} feasible")
+    if not len(ranked) and args.choose is None:
+        print("No scenario satisfies the constraints", file=sys.stderr)
+        sys.exit(1)
+
+    total = results["total"].sum(axis=1)
+    print(f"\n{'#':>6} {'type':<9} {'esc':>5} {'F&A':>5} {'direct/yr (max)':>16} {'total':>12}  effort")
+    for index in ranked[: args.list]:
+        efforts = ", ".join(
+            f"{name.split()[-1]} {effort:.0%}" for name, effort in zip(names, grid["effort"][index])
+        )
+        print(
+            f"{index:>6} {'modular' if results['modular'][index] else 'detailed':<9} "
+            f"{grid['escalation'][index]:>5.1%} {grid['fa_rate'][index]:>5.0%} "
+            f"{results['requested_direct'][index].max():>16,.0f} {total[index]:>12,.0f}  {efforts}"
+        )
+
+    choice = args.choose if args.choose is not None else int(ranked[0])
+    if not 0 <= choice < n:
+        print(f"Scenario index out of range: {choice}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.dry_run:
+        return
+
+    output = Path(args.output)
+    write_budget_data(scenario_data(inputs, grid, results, choice), output)
+    print(f"\nScenario {choice} written to {output}")
+
+
+if __name__ == "__main__":
+    main()
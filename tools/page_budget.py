@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+NIH Grant Page Budget Estimator
+
+Predicts how many pages each section of a Typst grant will take, without
+compiling it:
+- The main document is split into sections (headings and the template's
+  section functions), with content imported via `#let` blocks inlined
+- Words, figures, tables and paragraph/list blocks are counted per section
+- Pages are predicted by a linear model calibrated against grants that
+  have already been compiled (source .typ paired with its PDF)
+
+The Research Strategy and Specific Aims totals are checked against the NIH
+limits used by validate.py.
+
+Usage:
+    python tools/page_budget.py templates/R01/R01.typ
+    python tools/page_budget.py my_grants/my_r01/R01.typ --calibrate
+"""
+
+import sys
+import argparse
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from search_index import PDF_SECTIONS, pdf_heading, typst_sections
+from validate import GRANT_LIMITS, load_page_results
+
+ROOT_DIR = Path(__file__).parent.parent
+CACHE_DIR = ROOT_DIR / "data" / "cache"
+MODEL_FILE = CACHE_DIR / "page_budget_model.json"
+
+SPECIFIC_AIMS_PAGES = 1
+RESEARCH_STRATEGY_PARTS = {"SIGNIFICANCE", "INNOVATION", "APPROACH", "RESEARCH STRATEGY"}
+
+# Model features, in order, with the defaults used before any calibration
+# (11pt IBM Plex Sans, 0.5in margins, leading 0.8em)
+FEATURES = ("words", "figures", "tables", "blocks")
+DEFAULT_MODEL = {
+    "coefficients": [1 / 600, 0.35, 0.25, 0.02],
+    "samples": 0,
+}
+
+IMPORT_PATTERN = re.compile(r'#import\s+"([^"]+)"\s*:\s*([\w\-, ]+)')
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)?")
+MARKUP_PATTERNS = [
+    re.compile(r"//.*"),  # comments
+    re.compile(r'"[^"\n]*"'),  # string arguments (paths, options)
+    re.compile(r"#[\w.\-]+"),  # function calls and variables
+    re.compile(r"\b[\w\-]+:\s"),  # named arguments
+    re.compile(r"<[\w\-:.]+>|@[\w\-:.]+"),  # labels and citations
+]
+
+
+def _let_block(source: str, name: str) -> Optional[str]:
+    """Body of a `#let name = [...]` content block, or None"""
+    match = re.search(rf"#let\s+{re.escape(name)}\s*=\s*\[", source)
+    if not match:
+        return None
+    depth, start = 1, match.end()
+    for i in range(start, len(source)):
+        char = source[i]
+        if char == "\\":
+            continue
+        if char == "[" and source[i - 1] != "\\":
+            depth += 1
+        elif char == "]" and source[i - 1] != "\\":
+            depth -= 1
+            if depth == 0:
+                return source[start:i]
+    return None
+
+
+def resolve_imports(path: Path) -> str:
+    """Source of a Typst file with imported content blocks inlined"""
+    source = path.read_text(encoding="utf-8")
+    for target, names in IMPORT_PATTERN.findall(source):
+        imported = (path.parent / target).resolve()
+        if not imported.exists() or imported.suffix != ".typ":
+            continue
+        imported_source = imported.read_text(encoding="utf-8")
+        for name in (n.strip() for n in names.split(",")):
+            block = _let_block(imported_source, name)
+            if block is not None:
+                source = re.sub(rf"#{re.escape(name)}\b", lambda _: block, source)
+    return source
+
+
+def section_features(text: str) -> Dict[str, int]:
+    """Words, figures, tables and paragraph/list blocks in a section's source"""
+    figures = len(re.findall(r"#figure\(", text))
+    images = len(re.findall(r"#image\(", text))
+    tables = len(re.findall(r"#table\(", text))
+
+    prose = text
+    for pattern in MARKUP_PATTERNS:
+        prose = pattern.sub(" ", prose)
+
+    paragraphs = [block for block in re.split(r"\n\s*\n", prose) if block.strip()]
+    list_items = len(re.findall(r"^\s*(?:[-+]|\d+\.)\s", prose, re.MULTILINE))
+
+    return {
+        "words": len(WORD_PATTERN.findall(prose)),
+        "figures": max(figures, images),
+        "tables": tables,
+        "blocks": len(paragraphs) + list_items + 1,  # +1 for the heading
+    }
+
+
+def canonical_section(title: str) -> str:
+    """Section name shared by source and PDF (e.g. "Research Strategy: Approach" -> "APPROACH")"""
+    last = title.split(":")[-1]
+    return pdf_heading(last) or re.sub(r"[^A-Z ]", "", last.upper()).strip()
+
+
+def split_sections(path: Path) -> List[Tuple[str, str]]:
+    """(canonical section name, source text) for each section of a grant
+
+    Subheadings that are not NIH sections themselves (e.g. "Aim 1" or
+    "Personnel") are folded into the section they belong to.
+    """
+    sections = []
+    for title, _, text in typst_sections(resolve_imports(path)):
+        name = canonical_section(title)
+        if name not in PDF_SECTIONS and sections:
+            sections[-1] = (sections[-1][0], sections[-1][1] + "\n\n" + text)
+        else:
+            sections.append((name, text))
+    return sections
+
+
+def pdf_section_pages(pdf_path: Path) -> Dict[str, float]:
+    """Pages occupied by each section of a compiled PDF
+
+    Section boundaries are located by heading, with positions within a page
+    measured by the share of the page's text that precedes the heading.
+    """
+    pages, _, _ = load_page_results(pdf_path)
+    starts = []
+    for page_number, page in enumerate(pages):
+        text = page["text"]
+        offset = 0
+        for line in text.splitlines(keepends=True):
+            name = pdf_heading(line)
+            if name and (not starts or starts[-1][0] != name):
+                starts.append((name, page_number + offset / max(len(text), 1)))
+            offset += len(line)
+
+    extents = {}
+    for (name, start), (_, end) in zip(starts, starts[1:] + [(None, len(pages))]):
+        extents[name] = extents.get(name, 0.0) + end - start
+    return extents
+
+
+def calibration_pairs(root_dir: Path = ROOT_DIR) -> List[Tuple[Path, Path]]:
+    """(source, compiled PDF) pairs available for calibration
+
+    Templates are compiled beside their source (templates/R01/R01.pdf); grants
+    created by quick_start.py are compiled to outputs/<project>.pdf.
+    """
+    pairs = []
+    for grant in GRANT_LIMITS:
+        for source in sorted(root_dir.glob(f"templates/*/{grant}.typ")):
+            pdf = source.with_suffix(".pdf")
+            if pdf.exists():
+                pairs.append((source, pdf))
+        for source in sorted(root_dir.glob(f"my_grants/*/{grant}.typ")):
+            pdf = root_dir / "outputs" / f"{source.parent.name}.pdf"
+            if pdf.exists():
+                pairs.append((source, pdf))
+    return pairs
+
+
+def calibrate(pairs: List[Tuple[Path, Path]]) -> Dict:
+    """Fit pages-per-feature coefficients from compiled grants"""
+    rows, observed = [], []
+    for source, pdf in pairs:
+        extents = pdf_section_pages(pdf)
+        for name, text in split_sections(source):
+            features = section_features(text)
+            if name in extents and features["words"]:
+                rows.append([features[f] for f in FEATURES])
+                observed.append(extents[name])
+
+    model = dict(DEFAULT_MODEL, sources=[str(pdf) for _, pdf in pairs])
+    if not rows:
+        return model
+
+    X, y = np.array(rows, dtype=float), np.array(observed)
+    defaults = np.array(DEFAULT_MODEL["coefficients"])
+    coefficients, *_ = np.linalg.lstsq(X, y, rcond=None)
+
+    # With few samples or an implausible (negative) fit, only rescale words
+    # per page and keep the default costs of figures, tables and blocks
+    if len(rows) < 3 * len(FEATURES) or (coefficients < 0).any():
+        remainder = np.clip(y - X[:, 1:] @ defaults[1:], 0.05, None)
+        coefficients = np.concatenate([[remainder.sum() / X[:, 0].sum()], defaults[1:]])
+
+    model.update(coefficients=[float(c) for c in coefficients], samples=len(rows))
+    return model
+
+
+def load_model(model_file: Path = MODEL_FILE) -> Dict:
+    """Calibrated model, or the defaults if none has been fitted"""
+    try:
+        return json.loads(model_file.read_text())
+    except (OSError, ValueError):
+        return dict(DEFAULT_MODEL)
+
+
+def estimate(path: Path, model: Dict) -> List[Dict]:
+    """Predicted pages per section of a grant document
+
+    Features are recounted every time; a few regex passes per section are
+    cheaper than reading them back from a cache.
+    """
+    coefficients = np.array(model["coefficients"])
+
+    results = []
+    for name, text in split_sections(path):
+        features = section_features(text)
+        pages = float(coefficients @ np.array([features[f] for f in FEATURES]))
+        results.append({"section": name, **features, "pages": pages})
+    return results
+
+
+def check_budget(results: List[Dict], grant_type: str) -> Tuple[List[str], List[str]]:
+    """Errors and warnings for predicted section lengths"""
+    errors, warnings = [], []
+    limits = {
+        "Research Strategy": (
+            GRANT_LIMITS[grant_type].research_strategy,
+            sum(r["pages"] for r in results if r["section"] in RESEARCH_STRATEGY_PARTS),
+        ),
+        "Specific Aims": (
+            SPECIFIC_AIMS_PAGES,
+            sum(r["pages"] for r in results if r["section"] == "SPECIFIC AIMS"),
+        ),
+    }
+    for section, (limit, pages) in limits.items():
+        if pages > limit:
+            errors.append(f"{section} is estimated at {pages:.1f} pages (limit: {limit})")
+        elif pages > limit * 0.9:
+            warnings.append(f"{section} is estimated at {pages:.1f} pages, close to {limit}")
+    return errors, warnings
+
+
+def report(results: List[Dict], grant_type: str) -> bool:
+    """Print the per-section estimate and limit checks; True if within limits"""
+    print(f"{'Section':<22} {'Words':>6} {'Figs':>5} {'Tables':>6} {'Pages':>6}")
+    print("-" * 49)
+    for r in results:
+        print(
+            f"{r['section'][:22]:<22} {r['words']:>6} {r['figures']:>5} "
+            f"{r['tables']:>6} {r['pages']:>6.2f}"
+        )
+
+    errors, warnings = check_budget(results, grant_type)
+    for error in errors:
+        print(f"❌ {error}")
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+    if not errors and not warnings:
+        print(f"✅ Within {grant_type} page limits")
+    return not errors
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Estimate section page counts of a Typst grant without compiling",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+ python tools/page_budget.py templates/R01/R01.typ
+ python tools/page_budget.py my_grants/my_r01/R01.typ --type R01
+ python tools/page_budget.py my_grants/my_r01/R01.typ --calibrate
+        """,
+    )
+
+    parser.add_argument("source", help="Main Typst file of the grant")
+
+    parser.add_argument(
+        "--type",
+        choices=list(GRANT_LIMITS.keys()),
+        help="Grant type (auto-detected from filename if not specified)",
+    )
+
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Refit the model from compiled templates and outputs/ before estimating",
+    )
+
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if not source.exists():
+        print(f"File not found: {source}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.calibrate:
+        pairs = calibration_pairs()
+        model = calibrate(pairs)
+        MODEL_FILE.parent.mkdir(parents=True, exist_ok=True)
+        MODEL_FILE.write_text(json.dumps(model, indent=2) + "\n")
+        print(
+            f"Calibrated on {model['samples']} sections from {len(pairs)} compiled grant(s): "
+            f"{1 / model['coefficients'][0]:.0f} words/page\n"
+        )
+    else:
+        model = load_model()
+
+    grant_type = args.type or (
+        source.stem.upper() if source.stem.upper() in GRANT_LIMITS else "R01"
+    )
+    ok = report(estimate(source, model), grant_type)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ A user-friendly tool to create new grant applications from templates.
 import os
 import sys
 import shutil
+import argparse
 from pathlib import Path
 from datetime import datetime
 import questionary
@@ -16,6 +17,10 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts" / "helpers"))
+
+from profiling import add_profile_arguments, setup as setup_profiling, span, traced  # noqa: E402
+
 console = Console()
 
 
@@ -112,6 +117,7 @@ class GrantCreator:
 
         return info
 
+    @traced("grant.create")
     def _create_grant(self, grant_type, project_info):
         """Create grant from template"""
         if grant_type == "Cancel":
@@ -127,30 +133,31 @@ class GrantCreator:
         console.print(f"\nCreating {grant_type} grant in {project_dir}...")
 
         # Copy files
-        for item in template_dir.rglob("*"):
-            if item.is_file():
-                relative_path = item.relative_to(template_dir)
-                target_path = project_dir / relative_path
-                target_path.parent.mkdir(parents=True, exist_ok=True)
-
-                # Process .typ files to replace placeholders
-                if item.suffix == ".typ":
-                    content = item.read_text()
-                    content = content.replace("[Project Title]", project_info["title"])
-                    content = content.replace("[PI Name]", project_info["pi_name"])
-                    content = content.replace(
-                        "[Institution]", project_info["institution"]
-                    )
-                    content = content.replace(
-                        "Your Grant Title Here", project_info["title"]
-                    )
-                    content = content.replace("Dr. Jane Smith", project_info["pi_name"])
-                    content = content.replace(
-                        "University Medical Center", project_info["institution"]
-                    )
-                    target_path.write_text(content)
-                else:
-                    shutil.copy2(item, target_path)
+        with span("template.copy", template=grant_type):
+            for item in template_dir.rglob("*"):
+                if item.is_file():
+                    relative_path = item.relative_to(template_dir)
+                    target_path = project_dir / relative_path
+                    target_path.parent.mkdir(parents=True, exist_ok=True)
+
+                    # Process .typ files to replace placeholders
+                    if item.suffix == ".typ":
+                        content = item.read_text()
+                        content = content.replace("[Project Title]", project_info["title"])
+                        content = content.replace("[PI Name]", project_info["pi_name"])
+                        content = content.replace(
+                            "[Institution]", project_info["institution"]
+                        )
+                        content = content.replace(
+                            "Your Grant Title Here", project_info["title"]
+                        )
+                        content = content.replace("Dr. Jane Smith", project_info["pi_name"])
+                        content = content.replace(
+                            "University Medical Center", project_info["institution"]
+                        )
+                        target_path.write_text(content)
+                    else:
+                        shutil.copy2(item, target_path)
 
         # Create README for the project
         readme_content = f"""# {project_info['title']}
@@ -203,6 +210,13 @@ Add your project notes here...
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Create a new NIH grant application from a template"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    setup_profiling("quick_start", args)
+
     try:
         creator = GrantCreator()
         creator.run()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Quarto Progress Report Render Driver
+
+Renders only the chapters of the quarto/ book that changed since the last
+successful render:
+- A chapter is dirty when its .qmd, an included file, a data file it reads,
+  its bibliography/CSL, or _quarto.yml changed
+- Per-chapter formats (HTML) render only the dirty chapters, one Quarto
+  call at a time (concurrent renders of one project race on .quarto/ and
+  _book/)
+- Whole-book formats (PDF, DOCX, ...) render once if any chapter is dirty,
+  reusing frozen execution results from _freeze/ (freeze: auto)
+- Chapters whose data files changed are rendered with --cache-refresh, since
+  the knitr cache does not track files read by code chunks
+
+The renderer is pluggable; --renderer fake records what would be rendered
+without running Quarto, and leaves the saved render state untouched.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import yaml
+
+ROOT_DIR = Path(__file__).parent.parent
+PROJECT_DIR = ROOT_DIR / "quarto"
+STATE_FILE = ".render-state.json"
+
+# Formats where each chapter is its own output file
+PER_CHAPTER_FORMATS = {"html"}
+
+# File types treated as data dependencies when referenced from a chapter
+DATA_SUFFIXES = (
+    "csv|tsv|txt|json|rds|rda|RData|xlsx|xls|sav|parquet|feather|"
+    "png|jpg|jpeg|svg|pdf|bib|csl|R|py"
+)
+PATH_PATTERN = re.compile(rf"""["']([^"'\n]+\.(?:{DATA_SUFFIXES}))["']""")
+HERE_PATTERN = re.compile(r"""here(?:::here)?\(([^)]*)\)""")
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\(([^)\s]+)")
+INCLUDE_PATTERN = re.compile(r"\{\{<\s*include\s+([^\s>]+)\s*>\}\}")
+FRONT_MATTER_PATTERN = re.compile(r"\A---\n(.*?)\n---", re.DOTALL)
+
+
+class QuartoRenderer:
+    """Renders with the Quarto CLI"""
+
+    saves_state = True
+
+    def render(
+        self, project_dir: Path, target: Optional[str], fmt: str, refresh: bool
+    ) -> bool:
+        """Render one chapter (or the whole book if target is None)"""
+        cmd = ["quarto", "render"]
+        if target:
+            cmd.append(target)
+        cmd += ["--to", fmt]
+        if refresh:
+            cmd.append("--cache-refresh")
+
+        try:
+            result = subprocess.run(cmd, cwd=project_dir, capture_output=True, text=True)
+        except FileNotFoundError:
+            print("Quarto not found. Please install from https://quarto.org")
+            return False
+
+        if result.returncode != 0:
+            print(result.stderr.strip())
+            return False
+        return True
+
+
+class FakeRenderer:
+    """Records render calls instead of running Quarto (for tests and dry runs)
+
+    Nothing is actually rendered, so the render state is not saved.
+    """
+
+    saves_state = False
+
+    def __init__(self, fail: Set[str] = frozenset()):
+        self.calls: List[Tuple[Optional[str], str, bool]] = []
+        self.fail = fail
+
+    def render(
+        self, project_dir: Path, target: Optional[str], fmt: str, refresh: bool
+    ) -> bool:
+        self.calls.append((target, fmt, refresh))
+        return target not in self.fail
+
+
+RENDERERS = {"quarto": QuartoRenderer, "fake": FakeRenderer}
+
+
+def load_book(project_dir: Path) -> Dict:
+    """Read chapters, formats and shared inputs from _quarto.yml"""
+    config = yaml.safe_load((project_dir / "_quarto.yml").read_text(encoding="utf-8"))
+    book = config.get("book", {})
+
+    chapters = []
+    for entry in book.get("chapters", []) + book.get("appendices", []):
+        # Chapters may be plain paths or parts with their own chapter lists
+        if isinstance(entry, dict):
+            chapters += entry.get("chapters", [])
+            if "part" in entry and str(entry["part"]).endswith(".qmd"):
+                chapters.append(entry["part"])
+        else:
+            chapters.append(entry)
+
+    shared = ["_quarto.yml"]
+    for key in ("bibliography", "csl"):
+        value = config.get(key)
+        shared += value if isinstance(value, list) else [value] if value else []
+
+    return {
+        "chapters": chapters,
+        "formats": list((config.get("format") or {"html": None}).keys()),
+        "shared": shared,
+    }
+
+
+def _existing(candidates: List[Path]) -> Optional[Path]:
+    """First candidate path that exists"""
+    for path in candidates:
+        if path.is_file():
+            return path.resolve()
+    return None
+
+
+def chapter_dependencies(
+    chapter: Path, project_dir: Path, seen: Optional[Set[Path]] = None
+) -> Tuple[Set[Path], Set[Path]]:
+    """Source files and data files a chapter depends on
+
+    Returns (sources, data): sources are the chapter and anything it includes;
+    data are files referenced by path from code chunks, images or front matter.
+    Relative paths are resolved against the chapter and the project directory
+    (execute-dir: project).
+    """
+    seen = seen if seen is not None else set()
+    chapter = chapter.resolve()
+    if chapter in seen or not chapter.exists():
+        return set(), set()
+    seen.add(chapter)
+
+    content = chapter.read_text(encoding="utf-8")
+    sources, data = {chapter}, set()
+    bases = [chapter.parent, project_dir]
+
+    for target in INCLUDE_PATTERN.findall(content):
+        included = _existing([base / target for base in bases])
+        if included:
+            more_sources, more_data = chapter_dependencies(included, project_dir, seen)
+            sources |= more_sources
+            data |= more_data
+
+    references = PATH_PATTERN.findall(content) + IMAGE_PATTERN.findall(content)
+    for args in HERE_PATTERN.findall(content):
+        parts = re.findall(r"""["']([^"']+)["']""", args)
+        if parts:
+            references.append("/".join(parts))
+
+    front_matter = FRONT_MATTER_PATTERN.match(content)
+    if front_matter:
+        meta = yaml.safe_load(front_matter.group(1)) or {}
+        for key in ("bibliography", "csl"):
+            value = meta.get(key)
+            references += value if isinstance(value, list) else [value] if value else []
+
+    for reference in references:
+        path = _existing([base / reference for base in bases] + [ROOT_DIR / reference])
+        if path:
+            data.add(path)
+
+    return sources, data
+
+
+def _files_hash(paths: Set[Path]) -> str:
+    """Combined hash of a set of files' names and contents"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(str(path).encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def plan_renders(
+    project_dir: Path, formats: List[str], force: bool = False
+) -> Tuple[Dict, Dict[str, Dict[str, Dict[str, str]]]]:
+    """Work out which chapters are dirty for each format
+
+    Returns ({format: {chapter: refresh}}, new state). ``refresh`` is True
+    when a chapter's data files changed and its execution cache is stale.
+    """
+    book = load_book(project_dir)
+    state = {}
+    state_path = project_dir / STATE_FILE
+    if state_path.exists() and not force:
+        try:
+            state = json.loads(state_path.read_text())
+        except ValueError:
+            state = {}
+
+    shared = {project_dir / name for name in book["shared"] if (project_dir / name).exists()}
+    shared_hash = _files_hash(shared)
+
+    current = {}
+    for chapter in book["chapters"]:
+        sources, data = chapter_dependencies(project_dir / chapter, project_dir)
+        current[chapter] = {
+            "source": _files_hash(sources) + shared_hash,
+            "data": _files_hash(data),
+        }
+
+    plan = {}
+    new_state = {}
+    for fmt in formats:
+        previous = state.get(fmt, {})
+        dirty = {}
+        for chapter, hashes in current.items():
+            before = previous.get(chapter)
+            if before != hashes:
+                dirty[chapter] = before is not None and before["data"] != hashes["data"]
+        plan[fmt] = dirty
+        new_state[fmt] = {**previous, **current}
+    return plan, new_state
+
+
+def render_book(
+    project_dir: Path = PROJECT_DIR,
+    formats: Optional[List[str]] = None,
+    renderer=None,
+    force: bool = False,
+) -> bool:
+    """Render dirty chapters of the book and record what succeeded
+
+    State is only saved for renderers that really render (not FakeRenderer).
+    """
+    renderer = renderer or QuartoRenderer()
+    formats = formats or load_book(project_dir)["formats"]
+    plan, new_state = plan_renders(project_dir, formats, force)
+
+    state_path = project_dir / STATE_FILE
+    try:
+        saved = json.loads(state_path.read_text()) if state_path.exists() else {}
+    except ValueError:
+        saved = {}
+
+    all_ok = True
+    for fmt, dirty in plan.items():
+        if not dirty:
+            print(f"{fmt}: up to date")
+            continue
+
+        start = time.monotonic()
+        if fmt in PER_CHAPTER_FORMATS:
+            print(f"{fmt}: rendering {len(dirty)} chapter(s)")
+            # Sequential: renders of one project share .quarto/ and _book/
+            results = {
+                chapter: renderer.render(project_dir, chapter, fmt, refresh)
+                for chapter, refresh in dirty.items()
+            }
+        else:
+            print(f"{fmt}: rendering whole book ({len(dirty)} chapter(s) changed)")
+            ok = renderer.render(project_dir, None, fmt, any(dirty.values()))
+            results = {chapter: ok for chapter in dirty}
+
+        # Only record chapters that rendered, so failures are retried next time
+        fmt_state = saved.setdefault(fmt, {})
+        for chapter, hashes in new_state[fmt].items():
+            if chapter not in dirty or results.get(chapter):
+                fmt_state[chapter] = hashes
+
+        failed = sorted(chapter for chapter, ok in results.items() if not ok)
+        for chapter in failed:
+            print(f"   - Failed: {chapter}")
+        all_ok = all_ok and not failed
+        print(f"{fmt}: finished in {time.monotonic() - start:.1f}s")
+
+    if renderer.saves_state:
+        state_path.write_text(json.dumps(saved, indent=2, sort_keys=True) + "\n")
+    return all_ok
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Re-render only the changed chapters of the Quarto progress report",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+ python tools/render_book.py
+ python tools/render_book.py --to html
+ python tools/render_book.py --renderer fake
+        """,
+    )
+
+    parser.add_argument(
+        "--project", default=str(PROJECT_DIR), help="Quarto book directory (default: quarto/)"
+    )
+
+    parser.add_argument(
+        "--to", help="Comma-separated formats (default: all formats in _quarto.yml)"
+    )
+
+    parser.add_argument(
+        "--renderer",
+        choices=list(RENDERERS.keys()),
+        default="quarto",
+        help="Renderer to use; 'fake' lists renders without running Quarto or saving state",
+    )
+
+    parser.add_argument(
+        "--force", action="store_true", help="Render every chapter regardless of changes"
+    )
+
+    args = parser.parse_args()
+
+    project_dir = Path(args.project).resolve()
+    if not (project_dir / "_quarto.yml").exists():
+        print(f"No _quarto.yml found in {project_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    formats = args.to.split(",") if args.to else None
+    renderer = RENDERERS[args.renderer]()
+
+    ok = render_book(project_dir, formats, renderer, args.force)
+
+    if isinstance(renderer, FakeRenderer):
+        for target, fmt, refresh in renderer.calls:
+            print(f"  would render {target or '(book)'} to {fmt}" + (" (cache refresh)" if refresh else ""))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
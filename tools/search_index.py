@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Grant Full-Text Search
+
+Keeps an on-disk inverted index of past grant applications and answers
+BM25-ranked and phrase queries against it:
+- Typst sources under my_grants/, split into sections (headings, Specific
+  Aims, and the Significance/Innovation/Approach blocks of the Research
+  Strategy)
+- Compiled PDFs under outputs/, split into sections using the validator's
+  cached per-page text
+
+The index lives in a SQLite database (data/cache/search_index.sqlite).
+Each run re-indexes only files whose size/mtime and content hash changed,
+and drops files that no longer exist.
+
+Usage:
+    python tools/search_index.py                          # update the index
+    python tools/search_index.py "inhibitory control"
+    python tools/search_index.py '"stop signal task" fmri' --section approach
+"""
+
+import sys
+import argparse
+import hashlib
+import math
+import re
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from validate import load_page_results
+
+ROOT_DIR = Path(__file__).parent.parent
+DEFAULT_SOURCES = [ROOT_DIR / "my_grants", ROOT_DIR / "outputs"]
+INDEX_PATH = ROOT_DIR / "data" / "cache" / "search_index.sqlite"
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Typst structure recognised as section boundaries
+TYPST_HEADING = re.compile(r"^\s*(=+)\s+(.+?)\s*$")
+TYPST_HEADING_CALL = re.compile(r"^\s*#heading\([^\[]*\[(.+?)\]")
+TYPST_SECTION_CALLS = {
+    "specific_aims": "Specific Aims",
+    "research_strategy": "Research Strategy",
+    "references": "Bibliography",
+    "budget_example": "Budget",
+}
+TYPST_SECTION_CALL = re.compile(r"^\s*#(" + "|".join(TYPST_SECTION_CALLS) + r")\b")
+TYPST_SKIP = re.compile(r"^\s*#(import|include|set|show|let)\b")
+TYPST_LABEL_COMMENT = re.compile(r"^\s*//\s*(.+?)\s*$")
+
+# Headings that start a new section in compiled PDF text
+PDF_SECTIONS = [
+    "SPECIFIC AIMS",
+    "RESEARCH STRATEGY",
+    "SIGNIFICANCE",
+    "INNOVATION",
+    "APPROACH",
+    "BIBLIOGRAPHY",
+    "REFERENCES CITED",
+    "BUDGET",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    section TEXT NOT NULL,
+    location TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_file ON docs(file_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL REFERENCES docs(id) ON DELETE CASCADE,
+    tf INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, in order"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def typst_sections(text: str) -> List[Tuple[str, str, str]]:
+    """Split a Typst source into (section, location, text) sections
+
+    Boundaries are headings, the template's section functions
+    (#specific_aims, #research_strategy, ...) and, inside a section, a
+    ``// Name`` comment directly followed by a content block, which is how
+    the templates label the Research Strategy parts.
+    """
+    sections = []
+    title, parent, start, body = "Preamble", None, 1, []
+    lines = text.splitlines()
+
+    def flush():
+        content = "\n".join(body).strip()
+        if content:
+            sections.append((title, f"line {start}", content))
+
+    for number, line in enumerate(lines, 1):
+        heading = TYPST_HEADING.match(line) or TYPST_HEADING_CALL.match(line)
+        call = TYPST_SECTION_CALL.match(line)
+        label = TYPST_LABEL_COMMENT.match(line)
+        following = next((l.strip() for l in lines[number:] if l.strip()), "")
+
+        if heading:
+            new_title = heading.groups()[-1]
+            parent = None
+        elif call:
+            new_title = parent = TYPST_SECTION_CALLS[call.group(1)]
+        elif label and parent and following.startswith("["):
+            new_title = f"{parent}: {label.group(1)}"
+        else:
+            if not label and not TYPST_SKIP.match(line):
+                body.append(line)
+            continue
+
+        flush()
+        title, start, body = new_title, number, []
+
+    flush()
+    return sections
+
+
+def pdf_heading(line: str) -> Optional[str]:
+    """Section name (from PDF_SECTIONS) if a line of PDF text is a section heading"""
+    # Extracted text may split words ("CI TED"), so compare letters only
+    compact = re.sub(r"[^A-Z]", "", line.upper())
+    match = next(
+        (
+            name
+            for name in PDF_SECTIONS
+            if compact.startswith(name.replace(" ", ""))
+            or compact.endswith(name.replace(" ", ""))
+        ),
+        None,
+    )
+    # Short lines only, allowing numbering and "& Justification" style suffixes
+    if match and len(compact) <= len(match) + 16:
+        return match
+    return None
+
+
+def pdf_sections(pages: List[Dict]) -> List[Tuple[str, str, str]]:
+    """Split validator page results into (section, location, text) sections"""
+    sections = []
+    title, start, body = "Front Matter", 1, []
+
+    def flush():
+        content = "\n".join(body).strip()
+        if content:
+            sections.append((title, f"page {start}", content))
+
+    for page_number, page in enumerate(pages, 1):
+        for line in page["text"].splitlines():
+            match = pdf_heading(line)
+            if match and match.title() != title:
+                flush()
+                title, start, body = match.title(), page_number, []
+            body.append(line)
+
+    flush()
+    return sections
+
+
+def extract_sections(path: str) -> List[Tuple[str, str, str]]:
+    """Sections of one source file (runs in a worker process)"""
+    path = Path(path)
+    if path.suffix == ".pdf":
+        pages, _, _ = load_page_results(path)
+        return pdf_sections(pages)
+    return typst_sections(path.read_text(encoding="utf-8", errors="replace"))
+
+
+class SearchIndex:
+    """Incremental inverted index stored in SQLite"""
+
+    def __init__(self, index_path: Path = INDEX_PATH):
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(index_path))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def update(
+        self, sources: List[Path] = DEFAULT_SOURCES, jobs: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Bring the index up to date with the .typ and .pdf files under sources
+
+        Files indexed from other sources are kept unless they no longer exist.
+        """
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0, "errors": 0}
+        known = {
+            path: (file_id, mtime_ns, size, digest)
+            for file_id, path, mtime_ns, size, digest in self.db.execute(
+                "SELECT id, path, mtime_ns, size, hash FROM files"
+            )
+        }
+
+        files = []
+        for source in sources:
+            if source.is_file():
+                files.append(source)
+            elif source.is_dir():
+                files += [p for p in source.rglob("*") if p.suffix in (".typ", ".pdf")]
+
+        stale = {}
+        current = set()
+        for path in files:
+            key = str(path.resolve())
+            current.add(key)
+            stat = path.stat()
+            entry = known.get(key)
+            if entry and (entry[1], entry[2]) == (stat.st_mtime_ns, stat.st_size):
+                counts["unchanged"] += 1
+                continue
+            digest = file_hash(path)
+            if entry and entry[3] == digest:
+                self.db.execute(
+                    "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                    (stat.st_mtime_ns, stat.st_size, entry[0]),
+                )
+                counts["unchanged"] += 1
+                continue
+            stale[key] = (stat, digest)
+
+        roots = [source.resolve() for source in sources]
+        for key in set(known) - current:
+            path = Path(key)
+            in_sources = any(path == root or root in path.parents for root in roots)
+            if path.exists() and not in_sources:
+                continue
+            self.db.execute("DELETE FROM files WHERE id = ?", (known[key][0],))
+            counts["removed"] += 1
+
+        if stale:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(extract_sections, key): key for key in stale}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        sections = future.result()
+                    except Exception as e:
+                        print(f"{key}: ERROR extracting text: {e}", file=sys.stderr)
+                        counts["errors"] += 1
+                        continue
+                    stat, digest = stale[key]
+                    self._replace_file(key, stat, digest, sections)
+                    counts["indexed"] += 1
+
+        self.db.commit()
+        return counts
+
+    def _replace_file(self, path: str, stat, digest: str, sections) -> None:
+        """Replace a file's sections and postings"""
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+        file_id = self.db.execute(
+            "INSERT INTO files (path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, digest),
+        ).lastrowid
+
+        for section, location, text in sections:
+            tokens = tokenize(text)
+            doc_id = self.db.execute(
+                "INSERT INTO docs (file_id, section, location, length, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (file_id, section, location, len(tokens), text),
+            ).lastrowid
+
+            positions: Dict[str, array] = {}
+            for position, token in enumerate(tokens):
+                positions.setdefault(token, array("I")).append(position)
+            self.db.executemany(
+                "INSERT INTO postings (term, doc_id, tf, positions) VALUES (?, ?, ?, ?)",
+                (
+                    (term, doc_id, len(where), where.tobytes())
+                    for term, where in positions.items()
+                ),
+            )
+
+    def _postings(self, term: str) -> Dict[int, array]:
+        """Positions of a term, by document"""
+        postings = {}
+        for doc_id, blob in self.db.execute(
+            "SELECT doc_id, positions FROM postings WHERE term = ?", (term,)
+        ):
+            where = array("I")
+            where.frombytes(blob)
+            postings[doc_id] = where
+        return postings
+
+    def _term_frequencies(self, term: str) -> Dict[int, int]:
+        """Occurrence counts of a term, by document (positions not decoded)"""
+        return dict(
+            self.db.execute("SELECT doc_id, tf FROM postings WHERE term = ?", (term,))
+        )
+
+    def _phrase_postings(self, terms: List[str]) -> Dict[int, array]:
+        """Start positions of a phrase, by document"""
+        matches = self._postings(terms[0])
+        for offset, term in enumerate(terms[1:], 1):
+            if not matches:
+                break
+            following = self._postings(term)
+            narrowed = {}
+            for doc_id in matches.keys() & following.keys():
+                after = set(following[doc_id])
+                starts = array("I", (p for p in matches[doc_id] if p + offset in after))
+                if starts:
+                    narrowed[doc_id] = starts
+            matches = narrowed
+        return matches
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        section: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> List[Dict]:
+        """BM25-ranked search
+
+        Quoted phrases must all match; other words are optional and add to
+        the score. ``section`` filters by a case-insensitive substring of the
+        section name, ``kind`` by file type ("typ" or "pdf").
+        """
+        phrases = [tokenize(p) for p in re.findall(r'"([^"]+)"', query)]
+        phrases = [p for p in phrases if p]
+        words = tokenize(re.sub(r'"[^"]*"', " ", query))
+        if not phrases and not words:
+            return []
+
+        n_docs, total_length = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+        ).fetchone()
+        if not n_docs:
+            return []
+        avg_length = total_length / n_docs
+
+        # Term frequencies by document; phrases need positions, words do not
+        clauses = [
+            {doc_id: len(starts) for doc_id, starts in self._phrase_postings(p).items()}
+            for p in phrases
+        ]
+        clauses += [self._term_frequencies(w) for w in dict.fromkeys(words)]
+
+        candidates = None
+        for phrase_matches in clauses[: len(phrases)]:
+            candidates = (
+                set(phrase_matches) if candidates is None else candidates & set(phrase_matches)
+            )
+        if candidates is None:
+            candidates = set().union(*clauses)
+        if not candidates:
+            return []
+
+        # Rank on lengths and term frequencies; text is only read for the top hits
+        rows = self._doc_rows(candidates)
+        scores = dict.fromkeys(rows, 0.0)
+        for matches in clauses:
+            df = len(matches)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in matches.items():
+                if doc_id not in scores:
+                    continue
+                norm = 1 - BM25_B + BM25_B * rows[doc_id]["length"] / avg_length
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        results = []
+        for doc_id in sorted(scores, key=scores.get, reverse=True):
+            row = rows[doc_id]
+            if section and section.lower() not in row["section"].lower():
+                continue
+            if kind and not row["path"].endswith(f".{kind}"):
+                continue
+            row["id"], row["score"] = doc_id, scores[doc_id]
+            results.append(row)
+            if len(results) >= limit:
+                break
+
+        texts = self._doc_texts([row.pop("id") for row in results])
+        for row in results:
+            row["snippet"] = snippet(texts.pop(0), phrases + [[w] for w in words])
+        return results
+
+    def _doc_rows(self, doc_ids) -> Dict[int, Dict]:
+        """Document metadata (without text) for a set of document ids"""
+        rows = {}
+        doc_ids = list(doc_ids)
+        for i in range(0, len(doc_ids), 500):
+            batch = doc_ids[i : i + 500]
+            for doc_id, path, section, location, length in self.db.execute(
+                "SELECT docs.id, files.path, section, location, length "
+                "FROM docs JOIN files ON files.id = docs.file_id "
+                f"WHERE docs.id IN ({','.join('?' * len(batch))})",
+                batch,
+            ):
+                rows[doc_id] = {
+                    "path": path,
+                    "section": section,
+                    "location": location,
+                    "length": length,
+                }
+        return rows
+
+    def _doc_texts(self, doc_ids: List[int]) -> List[str]:
+        """Texts of documents, in the order given"""
+        texts = dict(
+            self.db.execute(
+                f"SELECT id, text FROM docs WHERE id IN ({','.join('?' * len(doc_ids))})",
+                doc_ids,
+            )
+        )
+        return [texts[doc_id] for doc_id in doc_ids]
+
+    def stats(self) -> Dict[str, int]:
+        """Number of files, sections and distinct terms in the index"""
+        return {
+            "files": self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+            "sections": self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0],
+            "terms": self.db.execute(
+                "SELECT COUNT(DISTINCT term) FROM postings"
+            ).fetchone()[0],
+        }
+
+
+def snippet(text: str, queries: List[List[str]], width: int = 160) -> str:
+    """Single-line excerpt of text around the first query match"""
+    flat = " ".join(text.split())
+    for terms in queries:
+        pattern = r"\W+".join(re.escape(t) for t in terms)
+        match = re.search(rf"\b{pattern}\b", flat, re.IGNORECASE)
+        if match:
+            start = max(0, match.start() - width // 3)
+            excerpt = flat[start : start + width]
+            return ("..." if start else "") + excerpt + ("..." if start + width < len(flat) else "")
+    return flat[:width]
+
+
+def _display_path(path: str) -> str:
+    """Path relative to the repository root where possible"""
+    try:
+        return str(Path(path).relative_to(ROOT_DIR.resolve()))
+    except ValueError:
+        return path
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Search past grant applications (Typst sources and compiled PDFs)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+ python tools/search_index.py
+ python tools/search_index.py "inhibitory control"
+ python tools/search_index.py '"stop signal task" adolescents' --section approach
+ python tools/search_index.py "power analysis" --kind pdf --limit 20
+        """,
+    )
+
+    parser.add_argument("query", nargs="?", help='Search query; quote phrases: \'"exact phrase"\'')
+
+    parser.add_argument(
+        "--source",
+        action="append",
+        help="File or directory to index (repeatable; default: my_grants/ and outputs/)",
+    )
+
+    parser.add_argument(
+        "--index", default=str(INDEX_PATH), help="Index database location"
+    )
+
+    parser.add_argument("--section", help="Only show results from matching sections")
+
+    parser.add_argument("--kind", choices=["typ", "pdf"], help="Only show results of this file type")
+
+    parser.add_argument("--limit", "-n", type=int, default=10, help="Number of results (default: 10)")
+
+    parser.add_argument(
+        "--no-update", action="store_true", help="Search without updating the index first"
+    )
+
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Worker processes for text extraction (default: CPUs)"
+    )
+
+    args = parser.parse_args()
+
+    index = SearchIndex(Path(args.index))
+    sources = [Path(s) for s in args.source] if args.source else DEFAULT_SOURCES
+
+    if not args.no_update:
+        start = time.perf_counter()
+        counts = index.update(sources, jobs=args.jobs)
+        if counts["indexed"] or counts["removed"] or counts["errors"] or not args.query:
+            print(
+                f"Indexed {counts['indexed']}, unchanged {counts['unchanged']}, "
+                f"removed {counts['removed']}, errors {counts['errors']} "
+                f"({time.perf_counter() - start:.2f}s)",
+                file=sys.stderr,
+            )
+
+    if not args.query:
+        stats = index.stats()
+        print(f"Index: {stats['files']} files, {stats['sections']} sections, {stats['terms']} terms")
+        index.close()
+        return
+
+    start = time.perf_counter()
+    results = index.search(args.query, limit=args.limit, section=args.section, kind=args.kind)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    index.close()
+
+    if not results:
+        print(f"No matches ({elapsed_ms:.1f} ms)")
+        sys.exit(1)
+
+    for rank, result in enumerate(results, 1):
+        print(
+            f"{rank:2}. {_display_path(result['path'])} ({result['location']}) "
+            f"[{result['section']}]  score {result['score']:.2f}"
+        )
+        print(f"    {result['snippet']}")
+    print(f"\n{len(results)} result(s) in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+NIH Grant Per-Section Compilation
+
+Compiles each major section of a grant on its own, in parallel, to get
+exact page counts instead of locating sections in the text of the full PDF:
+- Specific Aims, Research Strategy, Bibliography and Budget are taken from
+  the main document; Budget, Biosketch (and Specific Aims) fall back to the
+  examples in templates/shared/ when the main document does not contain them
+- Each section is wrapped in the grant's own config.typ show rule (without
+  the title block), so pagination matches the full document
+- Sections whose sources are unchanged since the last run are not recompiled
+
+The compiler is pluggable; --stub writes blank pages instead of running
+Typst, for tests.
+
+Usage:
+    python tools/section_compile.py templates/R01/R01.typ
+    python tools/section_compile.py my_grants/my_r01/R01.typ --jobs 4
+"""
+
+import os
+import sys
+import argparse
+import hashlib
+import json
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import PyPDF2
+
+from validate import GRANT_LIMITS
+
+ROOT_DIR = Path(__file__).parent.parent
+SHARED_DIR = ROOT_DIR / "templates" / "shared"
+CACHE_DIR = ROOT_DIR / "data" / "cache" / "sections"
+
+# Sections in report order, with the top-level statement that starts each
+# one in the main document
+SECTIONS = ["specific_aims", "research_strategy", "bibliography", "biosketch", "budget"]
+SECTION_MARKERS = {
+    "specific_aims": re.compile(r"^#specific_aims\b"),
+    "research_strategy": re.compile(r"^#research_strategy\b"),
+    "bibliography": re.compile(r"^#(references|bibliography)\b"),
+    "biosketch": re.compile(r"^#biosketch"),
+    "budget": re.compile(r"^(#heading\(level:\s*1,\s*\[BUDGET|=\s+BUDGET|#budget_example)", re.I),
+}
+
+# Examples in templates/shared/ used for sections the main document lacks:
+# (file, imported name, section content)
+SHARED_SECTIONS = {
+    "specific_aims": (
+        "specific_aims.typ",
+        "specific_aims_example",
+        "#specific_aims[\n  #specific_aims_example\n]",
+    ),
+    "budget": (
+        "budget.typ",
+        "budget_example",
+        "#heading(level: 1, [BUDGET & JUSTIFICATION])\n#budget_example",
+    ),
+    "biosketch": ("biosketch.typ", "biosketch_example", "#biosketch_example"),
+}
+
+# NIH page limits for sections other than the Research Strategy
+SPECIFIC_AIMS_PAGES = 1
+BIOSKETCH_PAGES = 5
+
+IMPORT_LINE = re.compile(r'^#import\s+"([^"]+)"\s*:\s*(.+)$')
+STRING_LITERAL = re.compile(r'"([^"\n]+\.[A-Za-z0-9]+)"')
+
+
+class TypstCompiler:
+    """Compiles with the typst Python package, or the typst CLI if unavailable"""
+
+    def compile(self, section: str, source: Path, output: Path, root: Path) -> None:
+        try:
+            import typst
+        except ImportError:
+            cmd = ["typst", "compile", "--root", str(root), str(source), str(output)]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip())
+            return
+        typst.compile(str(source), output=str(output), root=str(root))
+
+
+class StubCompiler:
+    """Writes blank pages instead of compiling (for tests)"""
+
+    def __init__(self, pages: Optional[Dict[str, int]] = None, default: int = 1):
+        self.pages = pages or {}
+        self.default = default
+
+    def compile(self, section: str, source: Path, output: Path, root: Path) -> None:
+        writer = PyPDF2.PdfWriter()
+        for _ in range(self.pages.get(section, self.default)):
+            writer.add_blank_page(width=612, height=792)
+        with open(output, "wb") as f:
+            writer.write(f)
+
+
+def _balanced(source: str, start: int) -> int:
+    """Index just past the bracket group opening at source[start]"""
+    pairs = {"(": ")", "[": "]", "{": "}"}
+    stack = []
+    in_string = False
+    for i in range(start, len(source)):
+        char = source[i]
+        if in_string:
+            if char == '"' and source[i - 1] != "\\":
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in pairs:
+            stack.append(pairs[char])
+        elif stack and char == stack[-1]:
+            stack.pop()
+            if not stack:
+                return i + 1
+    raise ValueError("Unbalanced brackets")
+
+
+def parse_document(source: str) -> Tuple[List[str], str, Dict[str, str]]:
+    """Split a main grant document into its imports, show rule and sections
+
+    Returns (import lines, show rule, {section: source}). Sections start at a
+    top-level statement matching SECTION_MARKERS and run until the next one.
+    """
+    imports = [line for line in source.splitlines() if IMPORT_LINE.match(line)]
+
+    match = re.search(r"^#show:\s*[\w\-]+\.with\(", source, re.MULTILINE)
+    if not match:
+        raise ValueError("No '#show: nih-grant.with(...)' rule found")
+    end = _balanced(source, match.end() - 1)
+    show_rule = source[match.start() : end]
+
+    sections = {}
+    current = None
+    for line in source[end:].splitlines():
+        name = next(
+            (name for name, marker in SECTION_MARKERS.items() if marker.match(line)), None
+        )
+        if name and name != current:
+            current = name
+            sections.setdefault(current, [])
+        if current:
+            sections[current].append(line)
+
+    return imports, show_rule, {name: "\n".join(lines).strip() for name, lines in sections.items()}
+
+
+def has_title_block_option(grant_dir: Path, import_lines: List[str]) -> bool:
+    """Whether an imported config defines the title-block parameter
+
+    Projects created from older templates don't, and would fail to compile
+    if it were passed.
+    """
+    for line in import_lines:
+        path = grant_dir / IMPORT_LINE.match(line).group(1)
+        if path.is_file() and re.search(r"\btitle-block\s*:", path.read_text(encoding="utf-8")):
+            return True
+    return False
+
+
+def without_title_block(show_rule: str) -> str:
+    """Show rule with the title block turned off"""
+    body = show_rule[: show_rule.rindex(")")].rstrip()
+    separator = "" if body.endswith(("(", ",")) else ","
+    return f"{body}{separator}\n  title-block: false\n)"
+
+
+def build_wrappers(
+    main_file: Path, root_dir: Path = ROOT_DIR
+) -> Dict[str, Tuple[str, List[Path]]]:
+    """Typst source and input files for each section of a grant
+
+    Each wrapper sits beside the main file, so relative paths resolve the
+    same way, and re-applies the main document's config show rule (with the
+    title block turned off if the config supports it).
+    """
+    grant_dir = main_file.parent
+    imports, show_rule, sections = parse_document(main_file.read_text(encoding="utf-8"))
+    if has_title_block_option(grant_dir, imports):
+        show_rule = without_title_block(show_rule)
+
+    wrappers = {}
+    for name in SECTIONS:
+        extra_imports = []
+        content = sections.get(name)
+        if content is None:
+            if name not in SHARED_SECTIONS:
+                continue
+            file_name, binding, content = SHARED_SECTIONS[name]
+            shared = SHARED_DIR / file_name
+            if not shared.exists():
+                continue
+            relative = Path(os.path.relpath(shared, grant_dir)).as_posix()
+            extra_imports.append(f'#import "{relative}": {binding}')
+
+        lines = imports + extra_imports
+        source = "\n".join(
+            [f"// Generated by tools/section_compile.py from {main_file.name}; do not edit"]
+            + lines
+            + ["", show_rule, "", content, ""]
+        )
+        wrappers[name] = (source, section_inputs(grant_dir, lines, content, root_dir))
+    return wrappers
+
+
+def _referenced_file(base_dir: Path, literal: str, root_dir: Path) -> Optional[Path]:
+    """File a Typst path literal points to ("/..." is relative to the root)"""
+    path = root_dir / literal.lstrip("/") if literal.startswith("/") else base_dir / literal
+    return path.resolve() if path.is_file() else None
+
+
+def section_inputs(
+    grant_dir: Path, import_lines: List[str], content: str, root_dir: Path = ROOT_DIR
+) -> List[Path]:
+    """Files a section depends on: modules it uses and files it references
+
+    Typst modules are followed transitively, so e.g. budget_data.typ counts
+    as an input of the budget section through budget.typ.
+    """
+    pending = []
+    for line in import_lines:
+        path, names = IMPORT_LINE.match(line).groups()
+        names = [n.strip() for n in names.split(",")]
+        used = "*" in names or any(re.search(rf"\b{re.escape(n)}\b", content) for n in names)
+        if used:
+            pending.append(_referenced_file(grant_dir, path, root_dir))
+    pending += [_referenced_file(grant_dir, s, root_dir) for s in STRING_LITERAL.findall(content)]
+
+    inputs = set()
+    while pending:
+        path = pending.pop()
+        if path is None or path in inputs:
+            continue
+        inputs.add(path)
+        if path.suffix == ".typ":
+            # Imports, includes and data files (image, json, ...) of the module
+            text = path.read_text(encoding="utf-8", errors="replace")
+            pending += [
+                _referenced_file(path.parent, s, root_dir) for s in STRING_LITERAL.findall(text)
+            ]
+
+    return sorted(inputs)
+
+
+def section_hash(source: str, inputs: List[Path]) -> str:
+    """Hash of a section wrapper and the contents of its inputs"""
+    digest = hashlib.sha256(source.encode())
+    for path in inputs:
+        digest.update(str(path).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _compile_section(
+    compiler, name: str, source: str, wrapper: str, output: str, root: str
+) -> int:
+    """Compile one section and count its pages (runs in a worker process)"""
+    wrapper, output = Path(wrapper), Path(output)
+    wrapper.write_text(source, encoding="utf-8")
+    try:
+        compiler.compile(name, wrapper, output, Path(root))
+    finally:
+        wrapper.unlink(missing_ok=True)
+    with open(output, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def compile_sections(
+    main_file: Path,
+    compiler=None,
+    only: Optional[List[str]] = None,
+    jobs: Optional[int] = None,
+    force: bool = False,
+    root_dir: Path = ROOT_DIR,
+    cache_dir: Path = CACHE_DIR,
+) -> Dict[str, Dict]:
+    """Compile out-of-date sections in parallel and return page counts
+
+    Returns {section: {"pages": int, "compiled": bool}} for every section
+    that compiled (or was up to date). Failures are reported and omitted.
+    Each compiler class has its own cache, so stub page counts are never
+    reported for a real compile.
+    """
+    compiler = compiler or TypstCompiler()
+    main_file = main_file.resolve()
+    key = hashlib.sha256(str(main_file).encode()).hexdigest()[:8]
+    out_dir = cache_dir / type(compiler).__name__ / f"{main_file.parent.name}-{key}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index_path = out_dir / "index.json"
+    try:
+        index = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        index = {}
+
+    wrappers = build_wrappers(main_file, root_dir)
+    if only:
+        wrappers = {name: wrapper for name, wrapper in wrappers.items() if name in only}
+
+    results = {}
+    stale = {}
+    for name, (source, inputs) in wrappers.items():
+        digest = section_hash(source, inputs)
+        cached = index.get(name, {})
+        if not force and cached.get("hash") == digest and (out_dir / f"{name}.pdf").exists():
+            results[name] = {"pages": cached["pages"], "compiled": False}
+        else:
+            stale[name] = (source, digest)
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(
+                    _compile_section,
+                    compiler,
+                    name,
+                    source,
+                    str(main_file.parent / f".section-{name}.typ"),
+                    str(out_dir / f"{name}.pdf"),
+                    str(root_dir),
+                ): name
+                for name, (source, _) in stale.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    print(f"  {name}: failed to compile ({e})", file=sys.stderr)
+                    index.pop(name, None)
+                    continue
+                index[name] = {"hash": stale[name][1], "pages": pages}
+                results[name] = {"pages": pages, "compiled": True}
+
+    index_path.write_text(json.dumps(index, indent=2, sort_keys=True) + "\n")
+    return {name: results[name] for name in SECTIONS if name in results}
+
+
+def section_limits(grant_type: str) -> Dict[str, int]:
+    """Page limit for each section that has one"""
+    return {
+        "specific_aims": SPECIFIC_AIMS_PAGES,
+        "research_strategy": GRANT_LIMITS[grant_type].research_strategy,
+        "biosketch": BIOSKETCH_PAGES,
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Compile each grant section separately for exact page counts",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+ python tools/section_compile.py templates/R01/R01.typ
+ python tools/section_compile.py my_grants/my_r01/R01.typ --sections research_strategy
+ python tools/section_compile.py templates/R03/R03.typ --stub
+        """,
+    )
+
+    parser.add_argument("main", help="Main Typst file of the grant")
+
+    parser.add_argument(
+        "--type",
+        choices=list(GRANT_LIMITS.keys()),
+        help="Grant type (auto-detected from filename if not specified)",
+    )
+
+    parser.add_argument(
+        "--sections",
+        help=f"Comma-separated sections to compile (default: all of {', '.join(SECTIONS)})",
+    )
+
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Number of worker processes (default: CPUs)"
+    )
+
+    parser.add_argument(
+        "--force", action="store_true", help="Recompile even if sources are unchanged"
+    )
+
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="Write one blank page per section instead of compiling (for tests)",
+    )
+
+    args = parser.parse_args()
+
+    main_file = Path(args.main)
+    if not main_file.exists():
+        print(f"File not found: {main_file}", file=sys.stderr)
+        sys.exit(1)
+
+    grant_type = args.type or (
+        main_file.stem.upper() if main_file.stem.upper() in GRANT_LIMITS else "R01"
+    )
+    only = args.sections.split(",") if args.sections else None
+    compiler = StubCompiler() if args.stub else TypstCompiler()
+
+    try:
+        results = compile_sections(main_file, compiler, only, args.jobs, args.force)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    limits = section_limits(grant_type)
+    over = False
+    print(f"\n{main_file.name} ({grant_type}) section page counts:")
+    for name, result in results.items():
+        limit = limits.get(name)
+        status = ""
+        if limit is not None:
+            over = over or result["pages"] > limit
+            status = "❌" if result["pages"] > limit else "✅"
+        note = "" if result["compiled"] else " (unchanged)"
+        shown_limit = f" / {limit}" if limit is not None else ""
+        print(f"  {status or '  '} {name:<18} {result['pages']}{shown_limit} pages{note}")
+
+    expected = set(only or SECTIONS) & set(build_wrappers(main_file))
+    failed = expected - set(results)
+    sys.exit(1 if over or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,19 @@ Validates compiled grant PDFs for NIH compliance including:
 
 import sys
 import argparse
+import difflib
+import hashlib
+import json
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts" / "helpers"))
+
+from profiling import add_profile_arguments, setup as setup_profiling, span, traced  # noqa: E402
 
 
 @dataclass
@@ -36,15 +44,257 @@ GRANT_LIMITS = {
     "K99": GrantLimits(research_strategy=12),
 }
 
+# Embedded object limits for the PDF size audit
+LARGE_IMAGE_MB = 1.0
+MAX_IMAGE_DPI = 300
+DUPLICATE_MIN_BYTES = 1024
+
+# Keys that point back up the document tree rather than at page content
+BACK_REFERENCE_KEYS = {"/Parent", "/P", "/Dest", "/B", "/Prev", "/Next", "/First", "/Last"}
+
+
+@dataclass
+class SizeReport:
+    """Bytes attributed to pages and object categories by the PDF size audit"""
+
+    by_category: Dict[str, int] = field(default_factory=dict)
+    by_page: Dict[int, int] = field(default_factory=dict)
+    images: List[Dict] = field(default_factory=list)
+    duplicates: List[Tuple[int, int, int]] = field(default_factory=list)
+
+
+def _stream_bytes(obj) -> bytes:
+    """Raw (still encoded) bytes of a stream object"""
+    data = getattr(obj, "_data", None)
+    return data if data is not None else obj.get_data()
+
+
+def iter_page_objects(page, visited: set):
+    """Yield (reference, object, category) for indirect objects reachable from a page
+
+    Objects whose idnum is already in ``visited`` are skipped (and ``visited``
+    is updated), so a walk over all pages yields each object exactly once.
+    Back references (/Parent etc.) are not followed.
+    """
+    stack = [(page.get("/Contents"), "content"), (page.get("/Resources"), "other")]
+    stack += [(page.get("/Annots"), "other")]
+
+    while stack:
+        value, category = stack.pop()
+        if value is None:
+            continue
+
+        reference = None
+        if isinstance(value, IndirectObject):
+            reference = value
+            if reference.idnum in visited:
+                continue
+            visited.add(reference.idnum)
+            value = value.get_object()
+
+        if isinstance(value, DictionaryObject):
+            subtype = value.get("/Subtype")
+            if subtype == "/Image":
+                category = "images"
+            elif subtype == "/Form":
+                category = "forms"
+
+            for key, child in value.items():
+                if key in BACK_REFERENCE_KEYS:
+                    continue
+                if key == "/Font" or key.startswith("/FontFile"):
+                    stack.append((child, "fonts"))
+                elif key == "/XObject":
+                    stack.append((child, "images"))
+                else:
+                    stack.append((child, category))
+        elif isinstance(value, ArrayObject):
+            stack.extend((child, category) for child in value)
+
+        if reference is not None:
+            yield reference, value, category
+
+
+# Section headings used to estimate Research Strategy pages
+SECTION_START = "RESEARCH STRATEGY"
+SECTION_ENDS = ["BIBLIOGRAPHY", "REFERENCES CITED", "BUDGET"]
+GRANT_ELEMENTS = ["SPECIFIC AIMS", "PROJECT", "TITLE"]
+
+# Bump when analyze_page results change shape, to invalidate old caches
+PAGE_CACHE_VERSION = 1
+
+
+def _hash_value(value, digest, memo: Dict[int, bytes], depth: int = 0):
+    """Feed a PDF object into a hash by content, independent of object numbers"""
+    if isinstance(value, IndirectObject):
+        if value.idnum not in memo:
+            memo[value.idnum] = b""  # Guards against reference cycles
+            sub = hashlib.sha256()
+            _hash_value(value.get_object(), sub, memo, depth + 1)
+            memo[value.idnum] = sub.digest()
+        digest.update(memo[value.idnum])
+    elif isinstance(value, StreamObject):
+        digest.update(b"stream")
+        digest.update(_stream_bytes(value))
+        _hash_value(DictionaryObject(value), digest, memo, depth)
+    elif isinstance(value, DictionaryObject):
+        digest.update(b"<<")
+        for key in sorted(value.keys()):
+            if key in BACK_REFERENCE_KEYS or key == "/Length":
+                continue
+            digest.update(key.encode())
+            _hash_value(value[key], digest, memo, depth)
+        digest.update(b">>")
+    elif isinstance(value, ArrayObject):
+        digest.update(b"[")
+        for child in value:
+            _hash_value(child, digest, memo, depth)
+        digest.update(b"]")
+    else:
+        digest.update(repr(value).encode())
+
+
+@traced("page.fingerprint")
+def page_fingerprint(page, memo: Dict[int, bytes]) -> str:
+    """Fingerprint of a page's content streams, resources and page box"""
+    digest = hashlib.sha256()
+    for key in ("/Contents", "/Resources", "/MediaBox", "/Rotate"):
+        digest.update(key.encode())
+        if key in page:
+            _hash_value(page.get(key) if key != "/Contents" else page.raw_get(key), digest, memo)
+    return digest.hexdigest()
+
+
+@traced("page.extract_text")
+def analyze_page(page) -> Dict:
+    """Per-page facts used by the validation checks"""
+    text = page.extract_text() or ""
+    upper = text.upper()
+    return {
+        "width": float(page.mediabox.width) / 72,  # Convert points to inches
+        "height": float(page.mediabox.height) / 72,
+        "starts_research_strategy": SECTION_START in upper,
+        "ends_research_strategy": any(section in upper for section in SECTION_ENDS),
+        "has_grant_elements": any(word in upper for word in GRANT_ELEMENTS),
+        "text": text,
+    }
+
+
+def page_cache_path(pdf_path: Path) -> Path:
+    """Location of the per-page results cache for a PDF"""
+    return pdf_path.with_name(f".{pdf_path.name}.pages.json")
+
+
+def diff_pages(old: List[str], new: List[str]) -> Dict[str, List[int]]:
+    """Compare two page fingerprint sequences
+
+    Returns 1-based page numbers (in the new version) that are unchanged,
+    changed or added, and 1-based page numbers of the old version removed.
+    """
+    diff = {"unchanged": [], "changed": [], "added": [], "removed": []}
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            diff["unchanged"].extend(range(j1 + 1, j2 + 1))
+        elif tag == "replace":
+            paired = min(i2 - i1, j2 - j1)
+            diff["changed"].extend(range(j1 + 1, j1 + paired + 1))
+            diff["added"].extend(range(j1 + paired + 1, j2 + 1))
+            diff["removed"].extend(range(i1 + paired + 1, i2 + 1))
+        elif tag == "insert":
+            diff["added"].extend(range(j1 + 1, j2 + 1))
+        elif tag == "delete":
+            diff["removed"].extend(range(i1 + 1, i2 + 1))
+    return diff
+
+
+def format_page_diff(diff: Dict[str, List[int]]) -> str:
+    """One-line summary of a page diff"""
+
+    def pages(numbers):
+        shown = ", ".join(f"p{n}" for n in numbers[:10])
+        return f" ({shown}{', ...' if len(numbers) > 10 else ''})" if numbers else ""
+
+    return (
+        f"{len(diff['changed'])} changed{pages(diff['changed'])}, "
+        f"{len(diff['added'])} added{pages(diff['added'])}, "
+        f"{len(diff['removed'])} removed{pages(diff['removed'])}, "
+        f"{len(diff['unchanged'])} unchanged"
+    )
+
+
+@traced("pdf.load_pages")
+def load_page_results(
+    pdf_path: Path, use_cache: bool = True
+) -> Tuple[List[Dict], List[str], Optional[List[str]]]:
+    """Analyze every page of a PDF, reusing cached results for unchanged pages
+
+    Returns the per-page results, the current page fingerprints, and the
+    fingerprints from the previous run (None if there was no cache).
+    """
+    cache_path = page_cache_path(pdf_path)
+    cached = {}
+    previous = None
+    if use_cache and cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text())
+            if data.get("version") == PAGE_CACHE_VERSION:
+                previous = data["fingerprints"]
+                cached = data["results"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    results = []
+    fingerprints = []
+    memo = {}
+    with open(pdf_path, "rb") as f:
+        with span("pdf.parse", file=pdf_path.name):
+            reader = PyPDF2.PdfReader(f)
+        for page in reader.pages:
+            fingerprint = page_fingerprint(page, memo)
+            fingerprints.append(fingerprint)
+            if fingerprint not in cached:
+                cached[fingerprint] = analyze_page(page)
+            results.append(cached[fingerprint])
+
+    if use_cache:
+        # Only keep results for pages in the current version
+        current = {fp: cached[fp] for fp in fingerprints}
+        try:
+            cache_path.write_text(
+                json.dumps(
+                    {
+                        "version": PAGE_CACHE_VERSION,
+                        "fingerprints": fingerprints,
+                        "results": current,
+                    }
+                )
+            )
+        except OSError:
+            pass  # Read-only location: validate without caching
+
+    return results, fingerprints, previous
+
+
+def pdf_page_fingerprints(pdf_path: Path) -> List[str]:
+    """Page fingerprints of a PDF, without analyzing page text"""
+    memo = {}
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [page_fingerprint(page, memo) for page in reader.pages]
+
 
 class NIHGrantValidator:
     """Validates NIH grant PDFs for compliance"""
 
-    def __init__(self, pdf_path: Path, grant_type: str = None):
+    def __init__(self, pdf_path: Path, grant_type: str = None, use_cache: bool = True):
         self.pdf_path = pdf_path
         self.grant_type = grant_type or self._detect_grant_type()
+        self.use_cache = use_cache
         self.errors = []
         self.warnings = []
+        self.pages = []
+        self.page_diff = None
 
     def _detect_grant_type(self) -> str:
         """Try to detect grant type from filename"""
@@ -54,6 +304,7 @@ class NIHGrantValidator:
                 return grant
         return "R01"  # Default
 
+    @traced("validate")
     def validate(self) -> bool:
         """Run all validation checks"""
         print(f"\nValidating {self.pdf_path.name} as {self.grant_type} grant...")
@@ -62,6 +313,7 @@ class NIHGrantValidator:
         # Run validation checks
         self._check_file_exists()
         self._check_file_size()
+        self._check_pdf_objects()
         self._check_page_count()
         self._check_page_dimensions()
         self._check_text_content()
@@ -78,6 +330,7 @@ class NIHGrantValidator:
             return False
         return True
 
+    @traced("check.file_size")
     def _check_file_size(self):
         """Check file size is within limits"""
         size_mb = self.pdf_path.stat().st_size / (1024 * 1024)
@@ -92,100 +345,185 @@ class NIHGrantValidator:
                 f"File size {size_mb:.2f} MB is close to {limit} MB limit"
             )
 
-    def _check_page_count(self):
-        """Verify page counts are within limits"""
+    @traced("check.pdf_objects")
+    def _check_pdf_objects(self):
+        """Attribute file size to pages and objects, and audit embedded images
+
+        Walks the object graph once, page by page. Each object is counted once,
+        against the first page that uses it; only sizes and hashes are kept, and
+        parsed objects are dropped from the reader's cache as the walk proceeds.
+        """
         try:
             with open(self.pdf_path, "rb") as f:
                 reader = PyPDF2.PdfReader(f)
-                page_count = len(reader.pages)
-
-            print(f"Total pages: {page_count}")
-
-            # Check specific section limits if we can detect them
-            self._check_section_pages(reader)
+                report = self._walk_pdf_objects(reader)
+        except Exception as e:
+            self.warnings.append(f"Could not analyze PDF objects: {str(e)}")
+            return
+
+        total = self.pdf_path.stat().st_size
+        attributed = sum(report.by_category.values())
+        breakdown = ", ".join(
+            f"{category} {size / 1024:.0f} KB"
+            for category, size in sorted(
+                report.by_category.items(), key=lambda item: -item[1]
+            )
+        )
+        print(f"Size breakdown: {breakdown or 'none'}")
+        print(f"  (unattributed structure/metadata: {(total - attributed) / 1024:.0f} KB)")
+
+        largest = sorted(report.by_page.items(), key=lambda item: -item[1])[:3]
+        if largest:
+            pages = ", ".join(f"p{page + 1} {size / 1024:.0f} KB" for page, size in largest)
+            print(f"Largest pages: {pages}")
+
+        for image in report.images:
+            where = f"Image on page {image['page'] + 1} ({image['width']}x{image['height']} px"
+            if image["size"] > LARGE_IMAGE_MB * 1024 * 1024:
+                self.warnings.append(
+                    f"{where}) is {image['size'] / (1024 * 1024):.1f} MB; "
+                    "consider compressing it"
+                )
+            if image["min_dpi"] > MAX_IMAGE_DPI:
+                self.warnings.append(
+                    f"{where}) is at least {image['min_dpi']:.0f} dpi even at full page "
+                    f"width; downsample to {MAX_IMAGE_DPI} dpi"
+                )
+
+        if report.duplicates:
+            wasted = sum(size for _, _, size in report.duplicates)
+            self.warnings.append(
+                f"{len(report.duplicates)} duplicate embedded objects waste "
+                f"{wasted / 1024:.0f} KB (e.g. objects {report.duplicates[0][0]} "
+                f"and {report.duplicates[0][1]})"
+            )
 
+    @traced("pdf.walk_objects")
+    def _walk_pdf_objects(self, reader) -> SizeReport:
+        """Single pass over every page's objects, collecting a SizeReport"""
+        report = SizeReport()
+        visited = set()
+        first_seen = {}  # stream content hash -> idnum
+        cache = getattr(reader, "resolved_objects", {})
+        images = {}  # idnum -> image entry
+        mask_of = {}  # idnum of a /SMask or /Mask image -> idnum of its image
+
+        for page_number, page in enumerate(reader.pages):
+            width_in = float(page.mediabox.width) / 72 or 8.5
+            for reference, obj, category in iter_page_objects(page, visited):
+                idnum = reference.idnum
+                if isinstance(obj, StreamObject):
+                    data = _stream_bytes(obj)
+                    size = len(data)
+                    digest = hashlib.sha1(data).digest()
+                    if size >= DUPLICATE_MIN_BYTES:
+                        if digest in first_seen:
+                            report.duplicates.append((first_seen[digest], idnum, size))
+                        else:
+                            first_seen[digest] = idnum
+                    if obj.get("/Subtype") == "/Image":
+                        width = int(obj.get("/Width", 0))
+                        images[idnum] = {
+                            "page": page_number,
+                            "width": width,
+                            "height": int(obj.get("/Height", 0)),
+                            "size": size,
+                            "min_dpi": width / width_in,
+                        }
+                        for key in ("/SMask", "/Mask"):
+                            mask = dict.get(obj, key)  # unresolved, to get its idnum
+                            if hasattr(mask, "idnum"):
+                                mask_of[mask.idnum] = idnum
+                else:
+                    size = 0  # Dictionaries are counted in the unattributed remainder
+
+                report.by_category[category] = report.by_category.get(category, 0) + size
+                report.by_page[page_number] = report.by_page.get(page_number, 0) + size
+
+                # Keep memory bounded: only sizes and hashes outlive the walk
+                cache.pop((reference.generation, idnum), None)
+
+        # Masks (e.g. the alpha channel of an RGBA PNG) belong to their image:
+        # count their bytes there and audit each placed image once
+        for mask_id, parent_id in mask_of.items():
+            mask = images.pop(mask_id, None)
+            if mask and parent_id in images:
+                images[parent_id]["size"] += mask["size"]
+        report.images = list(images.values())
+        return report
+
+    @traced("check.page_count")
+    def _check_page_count(self):
+        """Verify page counts are within limits"""
+        try:
+            self.pages, fingerprints, previous = load_page_results(
+                self.pdf_path, self.use_cache
+            )
         except Exception as e:
             self.errors.append(f"Error reading PDF: {str(e)}")
+            return
+
+        print(f"Total pages: {len(self.pages)}")
+
+        if previous is not None:
+            self.page_diff = diff_pages(previous, fingerprints)
+            print(f"Pages since last run: {format_page_diff(self.page_diff)}")
+
+        # Check specific section limits if we can detect them
+        self._check_section_pages()
 
-    def _check_section_pages(self, reader):
+    @traced("check.section_pages")
+    def _check_section_pages(self):
         """Check page limits for specific sections"""
         # This is a simplified check - in reality would need more sophisticated parsing
         research_strategy_pages = 0
         in_research_strategy = False
 
-        try:
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text().upper()
-
-                if "RESEARCH STRATEGY" in text:
-                    in_research_strategy = True
-                elif any(
-                    section in text
-                    for section in ["BIBLIOGRAPHY", "REFERENCES CITED", "BUDGET"]
-                ):
-                    in_research_strategy = False
-
-                if in_research_strategy:
-                    research_strategy_pages += 1
-
-            limit = GRANT_LIMITS[self.grant_type].research_strategy
-
-            if research_strategy_pages > 0:
-                print(f"Research Strategy pages (estimated): {research_strategy_pages}")
-                if research_strategy_pages > limit:
-                    self.errors.append(
-                        f"Research Strategy ({research_strategy_pages} pages) exceeds {limit} page limit"
-                    )
-                elif research_strategy_pages > limit * 0.9:
-                    self.warnings.append(
-                        f"Research Strategy ({research_strategy_pages} pages) is close to {limit} page limit"
-                    )
-
-        except Exception as e:
-            self.warnings.append(f"Could not analyze section pages: {str(e)}")
-
+        for page in self.pages:
+            if page["starts_research_strategy"]:
+                in_research_strategy = True
+            elif page["ends_research_strategy"]:
+                in_research_strategy = False
+
+            if in_research_strategy:
+                research_strategy_pages += 1
+
+        limit = GRANT_LIMITS[self.grant_type].research_strategy
+
+        if research_strategy_pages > 0:
+            print(f"Research Strategy pages (estimated): {research_strategy_pages}")
+            if research_strategy_pages > limit:
+                self.errors.append(
+                    f"Research Strategy ({research_strategy_pages} pages) exceeds {limit} page limit"
+                )
+            elif research_strategy_pages > limit * 0.9:
+                self.warnings.append(
+                    f"Research Strategy ({research_strategy_pages} pages) is close to {limit} page limit"
+                )
+
+    @traced("check.page_dimensions")
     def _check_page_dimensions(self):
         """Verify page dimensions meet NIH requirements"""
-        try:
-            with open(self.pdf_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                if len(reader.pages) > 0:
-                    page = reader.pages[0]
-                    width = float(page.mediabox.width) / 72  # Convert points to inches
-                    height = float(page.mediabox.height) / 72
+        if not self.pages:
+            return
 
-                    print(f'Page dimensions: {width:.2f}" x {height:.2f}"')
+        width = self.pages[0]["width"]
+        height = self.pages[0]["height"]
 
-                    # Check for US Letter size (8.5 x 11 inches)
-                    if abs(width - 8.5) > 0.1 or abs(height - 11) > 0.1:
-                        self.errors.append(
-                            f'Page size must be US Letter (8.5" x 11"), found {width:.2f}" x {height:.2f}"'
-                        )
+        print(f'Page dimensions: {width:.2f}" x {height:.2f}"')
 
-        except Exception as e:
-            self.warnings.append(f"Could not check page dimensions: {str(e)}")
+        # Check for US Letter size (8.5 x 11 inches)
+        if abs(width - 8.5) > 0.1 or abs(height - 11) > 0.1:
+            self.errors.append(
+                f'Page size must be US Letter (8.5" x 11"), found {width:.2f}" x {height:.2f}"'
+            )
 
+    @traced("check.text_content")
     def _check_text_content(self):
         """Basic text content validation"""
-        try:
-            with open(self.pdf_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-
-                # Check first page for basic content
-                if len(reader.pages) > 0:
-                    first_page_text = reader.pages[0].extract_text()
-
-                    # Look for common required elements
-                    if not any(
-                        word in first_page_text.upper()
-                        for word in ["SPECIFIC AIMS", "PROJECT", "TITLE"]
-                    ):
-                        self.warnings.append(
-                            "First page may be missing standard grant elements"
-                        )
-
-        except Exception as e:
-            self.warnings.append(f"Could not analyze text content: {str(e)}")
+        # Check first page for basic content
+        if self.pages and not self.pages[0]["has_grant_elements"]:
+            self.warnings.append("First page may be missing standard grant elements")
 
     def _report_results(self):
         """Print validation results"""
@@ -208,12 +546,14 @@ class NIHGrantValidator:
         print("\n" + "=" * 50)
 
 
-def validate_multiple_pdfs(pdf_paths: List[Path], grant_type: str = None) -> bool:
+def validate_multiple_pdfs(
+    pdf_paths: List[Path], grant_type: str = None, use_cache: bool = True
+) -> bool:
     """Validate multiple PDF files"""
     all_valid = True
 
     for pdf_path in pdf_paths:
-        validator = NIHGrantValidator(pdf_path, grant_type)
+        validator = NIHGrantValidator(pdf_path, grant_type, use_cache)
         if not validator.validate():
             all_valid = False
 
@@ -230,6 +570,7 @@ Examples:
  python validate.py grant.pdf
  python validate.py grant.pdf --type R03
  python validate.py *.pdf --type R01
+ python validate.py grant.pdf --diff-against old_grant.pdf
         """,
     )
 
@@ -245,13 +586,35 @@ Examples:
         "--strict", action="store_true", help="Treat warnings as errors"
     )
 
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-analyze every page instead of reusing results for unchanged pages",
+    )
+
+    parser.add_argument(
+        "--diff-against",
+        metavar="OLD_PDF",
+        help="Summarize which pages changed relative to an older version and exit",
+    )
+
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
+    setup_profiling("validate", args)
 
     # Convert to Path objects
     pdf_paths = [Path(pdf) for pdf in args.pdfs]
 
+    if args.diff_against:
+        old = pdf_page_fingerprints(Path(args.diff_against))
+        for pdf_path in pdf_paths:
+            diff = diff_pages(old, pdf_page_fingerprints(pdf_path))
+            print(f"{pdf_path.name} vs {Path(args.diff_against).name}: {format_page_diff(diff)}")
+        sys.exit(0)
+
     # Validate PDFs
-    all_valid = validate_multiple_pdfs(pdf_paths, args.type)
+    all_valid = validate_multiple_pdfs(pdf_paths, args.type, not args.no_cache)
 
     # Exit with appropriate code
     sys.exit(0 if all_valid else 1)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+NIH Grant Watch Mode
+
+Watches a grant directory and, after each burst of saves, reruns only the
+pipeline stages affected by the changed files:
+- Page budget estimate from the sources (page_budget.py), before compiling
+- Compile (typst compile)
+- Page/section validation (validate.py)
+- Citation cross-check (reference_formatter.py)
+"""
+
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from validate import GRANT_LIMITS, NIHGrantValidator
+from page_budget import estimate, load_model, report
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR / "scripts" / "helpers"))
+
+from reference_formatter import collect_grant_citations, parse_bibtex  # noqa: E402
+
+
+# Pipeline stages, in the order they run
+STAGES = ("budget", "compile", "validate", "citations")
+
+# Stages affected by a change to a file with the given suffix
+STAGE_TRIGGERS = {
+    ".typ": {"budget", "compile", "validate", "citations"},
+    ".bib": {"compile", "validate", "citations"},
+    ".yml": {"compile", "validate", "citations"},
+    ".yaml": {"compile", "validate", "citations"},
+    ".png": {"compile", "validate"},
+    ".jpg": {"compile", "validate"},
+    ".jpeg": {"compile", "validate"},
+    ".svg": {"compile", "validate"},
+    ".csv": {"compile", "validate"},
+    ".json": {"compile", "validate"},
+    ".pdf": {"validate"},
+}
+
+Snapshot = Dict[Path, Tuple[int, int]]
+
+
+def snapshot(directories: List[Path], ignore: Set[Path] = frozenset()) -> Snapshot:
+    """Record (mtime, size) for every watched file in the given directories"""
+    state = {}
+    for directory in directories:
+        for path in directory.rglob("*"):
+            if any(part.startswith(".") for part in path.relative_to(directory).parts):
+                continue
+            if path.suffix.lower() not in STAGE_TRIGGERS or path in ignore:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Deleted between listing and stat (e.g. editor swap files)
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+def changed_files(old: Snapshot, new: Snapshot) -> Set[Path]:
+    """Files added, removed or modified between two snapshots"""
+    return {path for path in old.keys() | new.keys() if old.get(path) != new.get(path)}
+
+
+def stages_for(changes: Set[Path]) -> List[str]:
+    """Pipeline stages affected by a set of changed files, in run order"""
+    needed = set()
+    for path in changes:
+        needed |= STAGE_TRIGGERS.get(path.suffix.lower(), set())
+    return [stage for stage in STAGES if stage in needed]
+
+
+def find_main_file(grant_dir: Path) -> Optional[Path]:
+    """Find the main grant document (e.g. R01.typ) in a grant directory"""
+    for grant in GRANT_LIMITS.keys():
+        candidate = grant_dir / f"{grant}.typ"
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def import_dirs(typ_file: Path) -> Set[Path]:
+    """Directories of files imported or included by a Typst document, transitively"""
+    _, sources = collect_grant_citations(typ_file)
+    return {path.parent for path in sources}
+
+
+class GrantWatcher:
+    """Polls a grant directory and reruns affected pipeline stages"""
+
+    def __init__(
+        self,
+        grant_dir: Path,
+        main_file: Path,
+        output_pdf: Path,
+        grant_type: str = None,
+        root_dir: Path = ROOT_DIR,
+        interval: float = 0.5,
+        debounce: float = 1.0,
+    ):
+        self.grant_dir = grant_dir.resolve()
+        self.main_file = main_file.resolve()
+        self.output_pdf = output_pdf.resolve()
+        self.grant_type = grant_type
+        self.root_dir = root_dir
+        self.interval = interval
+        self.debounce = debounce
+        self.watch_dirs = self._find_watch_dirs()
+
+    def _find_watch_dirs(self) -> List[Path]:
+        """The grant directory plus every directory its sources import from"""
+        return sorted({self.grant_dir} | import_dirs(self.main_file))
+
+    def run(self):
+        """Watch for changes until interrupted"""
+        print(f"Watching {', '.join(str(d) for d in self.watch_dirs)}")
+        print("Press Ctrl+C to stop.\n")
+
+        # Initial full run so the first save only reports what changed
+        self.run_pipeline(list(STAGES))
+
+        state = snapshot(self.watch_dirs, ignore={self.output_pdf})
+        pending = set()
+        last_change = 0.0
+
+        while True:
+            time.sleep(self.interval)
+            new_state = snapshot(self.watch_dirs, ignore={self.output_pdf})
+            changes = changed_files(state, new_state)
+            state = new_state
+
+            if changes:
+                pending |= changes
+                last_change = time.monotonic()
+                continue
+
+            # Debounce: wait until saves have been quiet for a while
+            if pending and time.monotonic() - last_change >= self.debounce:
+                names = ", ".join(sorted(p.name for p in pending))
+                print(f"\nChanged: {names}")
+                watch_dirs = self.watch_dirs
+                self.run_pipeline(stages_for(pending))
+                pending = set()
+                if self.watch_dirs != watch_dirs:
+                    # Don't report files in newly watched directories as changes
+                    state = snapshot(self.watch_dirs, ignore={self.output_pdf})
+
+    def run_pipeline(self, stages: List[str]) -> bool:
+        """Run the requested stages, stopping if compilation fails"""
+        start = time.monotonic()
+        ok = True
+
+        if "budget" in stages:
+            # Advisory only: the compiled PDF is the authority on page counts
+            self._estimate_budget()
+
+        if "compile" in stages:
+            ok = self._compile()
+            # Imports may have been added or removed since the last compile
+            watch_dirs = self._find_watch_dirs()
+            if watch_dirs != self.watch_dirs:
+                print(f"Now watching {', '.join(str(d) for d in watch_dirs)}")
+                self.watch_dirs = watch_dirs
+
+        if ok and "validate" in stages:
+            ok = self._validate()
+
+        if "citations" in stages:
+            ok = self._check_citations() and ok
+
+        elapsed = time.monotonic() - start
+        status = "✅" if ok else "❌"
+        print(f"{status} {', '.join(stages)} finished in {elapsed:.1f}s")
+        return ok
+
+    def _estimate_budget(self) -> bool:
+        """Predict section page counts from the sources, without compiling"""
+        print("Estimated page budget:")
+        return report(estimate(self.main_file, load_model()), self.grant_type or "R01")
+
+    def _compile(self) -> bool:
+        """Compile the main document with Typst"""
+        self.output_pdf.parent.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "typst",
+            "compile",
+            "--root",
+            str(self.root_dir),
+            str(self.main_file),
+            str(self.output_pdf),
+        ]
+        print(f"Compiling {self.main_file.name}...")
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        except FileNotFoundError:
+            print("Typst not found. Please install from https://typst.app")
+            return False
+
+        if result.returncode != 0:
+            print(result.stderr.strip())
+            return False
+        return True
+
+    def _validate(self) -> bool:
+        """Run the NIH compliance checks on the compiled PDF"""
+        validator = NIHGrantValidator(self.output_pdf, self.grant_type)
+        return validator.validate()
+
+    def _check_citations(self) -> bool:
+        """Cross-check citation keys against the bibliography"""
+        # Includes sections imported from outside the grant directory (../shared)
+        cited, _ = collect_grant_citations(self.grant_dir)
+
+        entries = []
+        for bib_file in self.grant_dir.rglob("*.bib"):
+            entries.extend(parse_bibtex(bib_file.read_text(encoding="utf-8")))
+        keys = {entry.key for entry in entries}
+
+        missing = sorted(cited - keys)
+        unused = sorted(keys - cited)
+
+        print(f"Citations: {len(cited)} cited, {len(keys)} in bibliography")
+        for key in missing:
+            print(f"   - Missing bibliography entry: {key}")
+        if unused:
+            print(f"   ({len(unused)} bibliography entries not cited)")
+
+        return not missing
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Recompile and revalidate a grant whenever its files change",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+ python tools/watch.py my_grants/my_r01
+ python tools/watch.py templates/R03 --output outputs/R03_template.pdf
+ python tools/watch.py my_grants/my_r01 --debounce 2
+        """,
+    )
+
+    parser.add_argument("grant_dir", help="Grant directory to watch")
+
+    parser.add_argument(
+        "--main", help="Main Typst file (default: <grant type>.typ in grant_dir)"
+    )
+
+    parser.add_argument(
+        "--output", help="Compiled PDF path (default: outputs/<grant_dir name>.pdf)"
+    )
+
+    parser.add_argument(
+        "--type",
+        choices=list(GRANT_LIMITS.keys()),
+        help="Grant type (auto-detected from filename if not specified)",
+    )
+
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="Seconds between file system polls (default: 0.5)",
+    )
+
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=1.0,
+        help="Quiet period in seconds before rerunning (default: 1.0)",
+    )
+
+    args = parser.parse_args()
+
+    grant_dir = Path(args.grant_dir)
+    if not grant_dir.is_dir():
+        print(f"Grant directory not found: {grant_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    main_file = Path(args.main) if args.main else find_main_file(grant_dir)
+    if not main_file or not main_file.exists():
+        print(f"No main Typst file found in {grant_dir}; use --main", file=sys.stderr)
+        sys.exit(1)
+
+    output_pdf = (
+        Path(args.output)
+        if args.output
+        else ROOT_DIR / "outputs" / f"{grant_dir.resolve().name}.pdf"
+    )
+    grant_type = args.type or (
+        main_file.stem.upper() if main_file.stem.upper() in GRANT_LIMITS else None
+    )
+
+    watcher = GrantWatcher(
+        grant_dir,
+        main_file,
+        output_pdf,
+        grant_type=grant_type,
+        interval=args.interval,
+        debounce=args.debounce,
+    )
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()